@@ -0,0 +1,170 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-stock-valuation")
+@click.option(
+    "--dry-run", is_flag=True, default=False, help="Print the corrections without writing them"
+)
+@click.option("--workers", type=int, help="Number of worker processes, defaults to the CPU count")
+@click.option("--item", "items", multiple=True, help="Only rebuild this item (repeatable)")
+@pass_context
+def rebuild_stock_valuation(context, dry_run=False, workers=None, items=None):
+    """Recompute moving-average valuation for the whole stock ledger."""
+    import frappe
+
+    from xwms.x_warehouse_management_system.valuation_rebuild import rebuild_valuation
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+
+    try:
+        result = rebuild_valuation(dry_run=dry_run, workers=workers, items=items)
+
+        if dry_run:
+            click.echo("doctype\tname\titem\twarehouse\tfield\told\tnew")
+            for doctype, changes in (
+                ("Stock Ledger Entry", result.sle_changes),
+                ("Bin", result.bin_changes),
+            ):
+                for name, item, warehouse, fields in changes:
+                    for field, (old, new) in fields.items():
+                        click.echo(f"{doctype}\t{name}\t{item}\t{warehouse}\t{field}\t{old}\t{new}")
+
+        click.secho(
+            f"{len(result.sle_changes)} ledger entries and {len(result.bin_changes)} bins "
+            f"{'would be corrected' if dry_run else 'corrected'} across {result.partitions} "
+            f"item/warehouse pairs in {result.passes} passes.",
+            fg="green",
+        )
+    finally:
+        frappe.destroy()
+
+
+@click.command("run-stock-benchmarks")
+@click.option("--items", type=int, default=200, help="Number of synthetic items")
+@click.option("--depth", type=int, default=3, help="Depth of the synthetic warehouse tree")
+@click.option("--fan-out", type=int, default=4, help="Children per group warehouse")
+@click.option("--days", type=int, default=365, help="Days of history the ledger spans")
+@click.option(
+    "--volumes", default="10000,100000", help="Comma separated ledger sizes to benchmark at"
+)
+@click.option(
+    "--submit-sizes", default="1,10,100,500", help="Comma separated Stock Entry line counts"
+)
+@click.option("--repeat", type=int, default=3, help="Runs per benchmark")
+@click.option("--seed", type=int, default=42, help="Seed for the data generator")
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the results to this JSON file")
+@click.option(
+    "--compare",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Baseline results to compare against",
+)
+@click.option(
+    "--tolerance", type=float, default=1.2, help="Median slowdown that counts as a regression"
+)
+@click.option("--keep-data", is_flag=True, default=False, help="Keep the synthetic data afterwards")
+@pass_context
+def run_stock_benchmarks(
+    context,
+    items,
+    depth,
+    fan_out,
+    days,
+    volumes,
+    submit_sizes,
+    repeat,
+    seed,
+    output=None,
+    compare=None,
+    tolerance=1.2,
+    keep_data=False,
+):
+    """Time Stock Entry posting and the stock reports on a synthetic ledger."""
+    import json
+
+    import frappe
+
+    from xwms.x_warehouse_management_system.benchmark import compare_results, run_benchmarks
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    frappe.set_user("Administrator")
+
+    try:
+        results = run_benchmarks(
+            volumes=[int(volume) for volume in volumes.split(",")],
+            submit_sizes=[int(size) for size in submit_sizes.split(",")],
+            repeat=repeat,
+            keep_data=keep_data,
+            items=items,
+            depth=depth,
+            fan_out=fan_out,
+            days=days,
+            seed=seed,
+        )
+    finally:
+        frappe.destroy()
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=1)
+    else:
+        click.echo(json.dumps(results, indent=1))
+
+    if compare:
+        with open(compare) as f:
+            baseline = json.load(f)
+
+        regressions = 0
+        for row in compare_results(baseline, results, tolerance):
+            regressions += row["regression"]
+            click.secho(
+                f"{row['benchmark']} {json.dumps(row['params'], sort_keys=True)}: "
+                f"{row['baseline']:.4f}s -> {row['current']:.4f}s ({row['ratio']:.2f}x)",
+                fg="red" if row["regression"] else None,
+                err=True,
+            )
+
+        if regressions:
+            click.secho(f"{regressions} benchmarks regressed beyond {tolerance}x", fg="red", err=True)
+            raise SystemExit(1)
+
+
+@click.command("archive-stock-ledger")
+@click.option(
+    "--before",
+    required=True,
+    help="Archive entries posted before this date, up to the last stock closing before it",
+)
+@pass_context
+def archive_stock_ledger(context, before):
+    """Move closed stock ledger history to Stock Ledger Entry Archive."""
+    import frappe
+
+    from xwms.x_warehouse_management_system.stock_ledger_archive import (
+        archive_stock_ledger,
+        get_archived_upto,
+    )
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+
+    try:
+        archived = archive_stock_ledger(before)
+        click.secho(
+            f"{archived} ledger entries archived; the ledger is archived up to "
+            f"{get_archived_upto() or 'no date yet'}.",
+            fg="green",
+        )
+    finally:
+        frappe.destroy()
+
+
+commands = [rebuild_stock_valuation, run_stock_benchmarks, archive_stock_ledger]
@@ -148,6 +148,17 @@ app_license = "mit"
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+	"hourly": [
+		"xwms.x_warehouse_management_system.doctype.stock_repost_entry.stock_repost_entry.process_repost_queue",
+		"xwms.x_warehouse_management_system.doctype.stock_reorder_alert.stock_reorder_alert.process_reorder_alerts"
+	],
+	"monthly": [
+		"xwms.x_warehouse_management_system.doctype.stock_closing_entry.stock_closing_entry.make_monthly_stock_closing",
+		"xwms.x_warehouse_management_system.stock_ledger_archive.archive_old_ledger_entries"
+	],
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"xwms.tasks.all"
@@ -197,7 +208,9 @@ app_license = "mit"
 # Request Events
 # ----------------
 # before_request = ["xwms.utils.before_request"]
-# after_request = ["xwms.utils.after_request"]
+after_request = [
+	"xwms.x_warehouse_management_system.instrumentation.add_instrumentation_header"
+]
 
 # Job Events
 # ----------
@@ -0,0 +1,6 @@
+import frappe
+
+
+def execute():
+    """Create the ledger creation index on sites installed before it existed."""
+    frappe.db.add_index("Stock Ledger Entry", ["creation"], index_name="creation_index")
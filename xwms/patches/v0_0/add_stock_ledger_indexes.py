@@ -0,0 +1,8 @@
+from xwms.x_warehouse_management_system.doctype.stock_ledger_entry.stock_ledger_entry import (
+    on_doctype_update,
+)
+
+
+def execute():
+    """Create the composite ledger indexes on sites installed before they existed."""
+    on_doctype_update()
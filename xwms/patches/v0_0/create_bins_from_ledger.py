@@ -0,0 +1,32 @@
+import frappe
+
+
+def execute():
+    """Build a Bin for every (item, warehouse) pair already in the ledger."""
+    balances = frappe.db.sql(
+        """
+            SELECT item, warehouse,
+                   SUM(actual_quantity) AS actual_qty,
+                   SUM(actual_quantity * valuation_rate) AS stock_value
+            FROM `tabStock Ledger Entry`
+            GROUP BY item, warehouse
+        """,
+        as_dict=True,
+    )
+
+    for row in balances:
+        if frappe.db.exists("Bin", {"item": row.item, "warehouse": row.warehouse}):
+            continue
+
+        frappe.get_doc(
+            {
+                "doctype": "Bin",
+                "item": row.item,
+                "warehouse": row.warehouse,
+                "actual_qty": row.actual_qty,
+                "stock_value": row.stock_value,
+                "valuation_rate": (
+                    row.stock_value / row.actual_qty if row.actual_qty > 0 else 0
+                ),
+            }
+        ).insert(ignore_permissions=True)
@@ -0,0 +1,31 @@
+import frappe
+
+
+def execute():
+    """Fill the running-balance columns on ledger entries posted before they existed."""
+    frappe.db.sql(
+        """
+            UPDATE `tabStock Ledger Entry` sle
+            INNER JOIN (
+                SELECT
+                    name,
+                    SUM(actual_quantity) OVER (
+                        PARTITION BY item, warehouse
+                        ORDER BY posting_date, creation, name
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                    ) AS qty_after,
+                    SUM(actual_quantity * valuation_rate) OVER (
+                        PARTITION BY item, warehouse
+                        ORDER BY posting_date, creation, name
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                    ) AS value_after
+                FROM `tabStock Ledger Entry`
+            ) running ON running.name = sle.name
+            SET
+                sle.qty_after_transaction = running.qty_after,
+                sle.stock_value_after = running.value_after,
+                sle.valuation_rate_after = IF(
+                    running.qty_after > 0, running.value_after / running.qty_after, 0
+                )
+        """
+    )
@@ -0,0 +1,476 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+"""Benchmarks for stock posting and the stock reports on synthetic data.
+
+`SyntheticStock` builds a warehouse tree, a catalogue of items and a stock
+ledger with realistic shapes: a few items account for most of the movement,
+quantities are skewed towards small lots, and rates drift around a per-item
+price. `run_benchmarks` grows the ledger through the requested volumes and,
+at each one, times Stock Entry submits of several sizes and the Stock
+Balance and Stock Ledger reports. Results are plain dicts, so they can be
+written as JSON and compared between releases with `compare_results`.
+
+Everything generated is named with the BENCH- prefix and removed again by
+`SyntheticStock.clear`. Run benchmarks on a throwaway site.
+"""
+
+import json
+import platform
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import frappe
+from frappe.utils import add_days, getdate, now_datetime, today
+
+from xwms.x_warehouse_management_system.report.stock_balance_report import (
+    stock_balance_report,
+)
+from xwms.x_warehouse_management_system.report.stock_ledger_report import (
+    stock_ledger_report,
+)
+from xwms.x_warehouse_management_system.stock_ledger import SLE_FIELDS
+from xwms.x_warehouse_management_system.valuation import FIFOQueue
+
+PREFIX = "BENCH-"
+INSERT_CHUNK_SIZE = 10000
+
+
+class SyntheticStock:
+    def __init__(
+        self, items=200, depth=3, fan_out=4, days=365, fifo_share=0.2, seed=42
+    ):
+        self.item_count = items
+        self.depth = depth
+        self.fan_out = fan_out
+        self.days = days
+        self.fifo_share = fifo_share
+        self.random = random.Random(seed)
+
+        self.root = None
+        self.leaves = []
+        self.items = []
+        self.prices = {}
+        self.fifo_items = set()
+        self.weights = []
+
+        # running state of every (item, warehouse) pair the ledger touched
+        self.balances = defaultdict(lambda: [0.0, 0.0])
+        self.queues = {}
+        self.rows = 0
+
+    def setup(self):
+        self.make_warehouse_tree()
+        self.make_items()
+
+    def make_warehouse_tree(self):
+        self.root = self.make_warehouse(f"{PREFIX}WH", is_group=1)
+        level = [self.root]
+        for depth in range(1, self.depth + 1):
+            is_group = int(depth < self.depth)
+            level = [
+                self.make_warehouse(f"{parent}-{idx}", is_group, parent)
+                for parent in level
+                for idx in range(1, self.fan_out + 1)
+            ]
+        self.leaves = level
+
+    def make_warehouse(self, name, is_group, parent=None):
+        return (
+            frappe.get_doc(
+                {
+                    "doctype": "Warehouse",
+                    "warehouse_name": name,
+                    "is_group": is_group,
+                    "parent_warehouse": parent,
+                }
+            )
+            .insert(ignore_permissions=True)
+            .name
+        )
+
+    def make_items(self):
+        timestamp = now_datetime()
+        values = []
+        for idx in range(1, self.item_count + 1):
+            code = f"{PREFIX}ITEM-{idx:06d}"
+            method = "FIFO" if self.random.random() < self.fifo_share else "Moving Average"
+            if method == "FIFO":
+                self.fifo_items.add(code)
+
+            self.items.append(code)
+            # prices are log-normal: mostly cheap parts, a tail of expensive units
+            self.prices[code] = round(self.random.lognormvariate(6, 1.2), 2)
+            values.append(
+                (code, timestamp, timestamp, "Administrator", "Administrator", code, code, method)
+            )
+
+        frappe.db.bulk_insert(
+            "Item",
+            (
+                "name",
+                "creation",
+                "modified",
+                "owner",
+                "modified_by",
+                "code",
+                "item_name",
+                "valuation_method",
+            ),
+            values,
+        )
+
+        # a few items account for most movements
+        self.weights = [1 / rank**1.1 for rank in range(1, len(self.items) + 1)]
+
+    def grow_ledger(self, rows, planned_rows=None):
+        """Append ledger rows until the ledger holds `rows` synthetic entries.
+
+        Rows are dated as if `planned_rows` rows were spread over `days` days,
+        so growing the ledger in steps only ever appends later entries.
+        """
+        planned_rows = max(planned_rows or rows, rows)
+        count = rows - self.rows
+        if count <= 0:
+            return
+
+        start_date = getdate(add_days(today(), -self.days))
+        creation = now_datetime()
+        user = frappe.session.user
+        values = []
+
+        for idx in range(count):
+            row = self.rows + idx
+            posting_date = start_date + timedelta(days=row * self.days // planned_rows)
+            item = self.random.choices(self.items, self.weights)[0]
+            warehouse = self.random.choice(self.leaves)
+            qty, rate = self.next_movement(item, warehouse)
+
+            balance = self.balances[(item, warehouse)]
+            balance[0] += qty
+            balance[1] += qty * rate
+            queue = self.queues.get((item, warehouse))
+
+            values.append(
+                (
+                    frappe.generate_hash(length=10),
+                    creation + timedelta(microseconds=row),
+                    creation + timedelta(microseconds=row),
+                    user,
+                    user,
+                    0,
+                    0,
+                    item,
+                    warehouse,
+                    posting_date,
+                    qty,
+                    rate,
+                    "Stock Entry",
+                    f"{PREFIX}SE-{row:08d}",
+                    None,
+                    0,
+                    balance[0],
+                    balance[1],
+                    balance[1] / balance[0] if balance[0] > 0 else 0,
+                    queue.as_json() if queue else None,
+                )
+            )
+
+            if len(values) >= INSERT_CHUNK_SIZE:
+                frappe.db.bulk_insert("Stock Ledger Entry", SLE_FIELDS, values)
+                values = []
+
+        frappe.db.bulk_insert("Stock Ledger Entry", SLE_FIELDS, values)
+        self.rows = rows
+        self.make_bins()
+        frappe.db.commit()
+
+    def next_movement(self, item, warehouse):
+        """Return (qty, rate) for the next entry of a pair, never going negative."""
+        qty_on_hand, value = self.balances[(item, warehouse)]
+        # most lots are small, with an occasional bulk delivery
+        lot = max(1, int(self.random.paretovariate(1.5) * 5))
+
+        if item in self.fifo_items:
+            queue = self.queues.setdefault((item, warehouse), FIFOQueue())
+        else:
+            queue = None
+
+        if qty_on_hand >= lot and self.random.random() < 0.6:
+            rate = value / qty_on_hand
+            if queue:
+                rate = queue.remove(lot) / lot
+            return -lot, rate
+
+        rate = round(self.prices[item] * self.random.uniform(0.9, 1.1), 2)
+        if queue:
+            queue.add(lot, rate)
+        return lot, rate
+
+    def make_bins(self):
+        frappe.db.sql("DELETE FROM `tabBin` WHERE item LIKE %s", f"{PREFIX}%")
+        timestamp = now_datetime()
+        frappe.db.bulk_insert(
+            "Bin",
+            (
+                "name",
+                "creation",
+                "modified",
+                "owner",
+                "modified_by",
+                "item",
+                "warehouse",
+                "actual_qty",
+                "stock_value",
+                "valuation_rate",
+                "stock_queue",
+            ),
+            [
+                (
+                    frappe.generate_hash(length=10),
+                    timestamp,
+                    timestamp,
+                    "Administrator",
+                    "Administrator",
+                    item,
+                    warehouse,
+                    qty,
+                    value,
+                    value / qty if qty > 0 else 0,
+                    self.queues[(item, warehouse)].as_json()
+                    if (item, warehouse) in self.queues
+                    else None,
+                )
+                for (item, warehouse), (qty, value) in self.balances.items()
+            ],
+            chunk_size=INSERT_CHUNK_SIZE,
+        )
+
+    def get_stocked_rows(self, warehouse, lines):
+        """Return up to `lines` consume rows for items with stock in `warehouse`."""
+        rows = []
+        for (item, pair_warehouse), (qty, _) in self.balances.items():
+            if pair_warehouse == warehouse and qty >= 1:
+                rows.append({"item": item, "quantity": 1})
+                if len(rows) == lines:
+                    break
+        return rows
+
+    def clear(self):
+        frappe.db.rollback()
+        for doctype, fieldname in (
+            ("Stock Repost Entry", "item"),
+            ("Stock Ledger Entry", "item"),
+            ("Bin", "item"),
+            ("Item", "name"),
+        ):
+            frappe.db.sql(
+                f"DELETE FROM `tab{doctype}` WHERE {fieldname} LIKE %s", f"{PREFIX}%"
+            )
+
+        # children first, so no group is deleted while it has children
+        for name in frappe.get_all(
+            "Warehouse",
+            filters={"name": ["like", f"{PREFIX}%"]},
+            order_by="lft desc",
+            pluck="name",
+        ):
+            frappe.delete_doc("Warehouse", name, ignore_permissions=True, force=True)
+
+        frappe.db.commit()
+
+
+def run_benchmarks(
+    volumes=(10000, 100000),
+    submit_sizes=(1, 10, 100, 500),
+    repeat=3,
+    keep_data=False,
+    **generator_options,
+):
+    """Grow a synthetic ledger through `volumes` rows and time postings and reports.
+
+    Returns {"meta": ..., "results": [...], "skipped": [...]}, where each
+    result names the benchmark, its parameters and the min/median/max of
+    `repeat` runs, and each skipped benchmark names why it could not run.
+    """
+    stock = SyntheticStock(**generator_options)
+    # every line of a timed submit is a different item, so the catalogue
+    # must hold the largest submit
+    stock.item_count = max(stock.item_count, *submit_sizes)
+    results = []
+    skipped = []
+
+    try:
+        stock.setup()
+
+        for volume in sorted(volumes):
+            stock.grow_ledger(volume, planned_rows=max(volumes))
+            context = {"ledger_rows": volume}
+
+            for lines in submit_sizes:
+                for entry_type in ("Receipt", "Consume"):
+                    params = {**context, "type": entry_type, "lines": lines}
+                    timings = time_submit(stock, entry_type, lines, repeat)
+                    if timings:
+                        results.append(make_result("stock_entry_submit", params, timings))
+                        continue
+
+                    reason = f"fewer than {lines} items to {entry_type.lower()}"
+                    frappe.logger("xwms.benchmark").warning(
+                        f"Skipping stock_entry_submit {params}: {reason}"
+                    )
+                    skipped.append(
+                        {"benchmark": "stock_entry_submit", "params": params, "reason": reason}
+                    )
+
+            for name, report, filters in get_report_cases(stock):
+                timings = [time_call(report, frappe._dict(filters)) for _ in range(repeat)]
+                results.append(make_result(name, {**context, **filters}, timings))
+    finally:
+        if not keep_data:
+            stock.clear()
+
+    return {
+        "meta": get_meta(stock, volumes, submit_sizes, repeat),
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def time_submit(stock, entry_type, lines, repeat):
+    warehouse = stock.leaves[0]
+    if entry_type == "Receipt":
+        rows = [
+            {"item": item, "quantity": 5, "valuation_rate": stock.prices[item]}
+            for item in stock.items[:lines]
+        ]
+    else:
+        rows = stock.get_stocked_rows(warehouse, lines)
+
+    # a shorter entry would be timed and reported under the wrong size
+    if len(rows) < lines:
+        return None
+
+    timings = []
+    for _ in range(repeat):
+        # every run is rolled back, so each one posts against the same ledger
+        frappe.db.savepoint("benchmark_submit")
+        doc = frappe.get_doc(
+            {
+                "doctype": "Stock Entry",
+                "type": entry_type,
+                "posting_date": today(),
+                "from_warehouse": warehouse if entry_type == "Consume" else None,
+                "to_warehouse": warehouse if entry_type == "Receipt" else None,
+                "items": rows,
+            }
+        ).insert(ignore_permissions=True)
+
+        # time the posting itself, never the hand-off to a background job
+        timings.append(time_call(doc._submit))
+        frappe.db.rollback(save_point="benchmark_submit")
+
+    return timings
+
+
+def get_report_cases(stock):
+    to_date = today()
+    from_date = add_days(to_date, -30)
+    top_item = stock.items[0]
+
+    # the Stock Balance Report's `execute` answers repeat runs from its
+    # result cache, so its runs time the computation behind it
+    return [
+        ("stock_balance_report", stock_balance_report.get_data, {"posting_date": to_date}),
+        (
+            "stock_balance_report",
+            stock_balance_report.get_data,
+            {"posting_date": to_date, "warehouse": stock.root},
+        ),
+        (
+            "stock_balance_report",
+            stock_balance_report.get_data,
+            {"posting_date": to_date, "item": top_item},
+        ),
+        (
+            "stock_ledger_report",
+            stock_ledger_report.execute,
+            {"from_date": from_date, "to_date": to_date},
+        ),
+        (
+            "stock_ledger_report",
+            stock_ledger_report.execute,
+            {"from_date": from_date, "to_date": to_date, "item": top_item},
+        ),
+    ]
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def make_result(benchmark, params, timings):
+    return {
+        "benchmark": benchmark,
+        "params": params,
+        "runs": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+    }
+
+
+def get_meta(stock, volumes, submit_sizes, repeat):
+    return {
+        "timestamp": str(now_datetime()),
+        "xwms_version": frappe.get_attr("xwms.__version__"),
+        "frappe_version": frappe.__version__,
+        "python_version": platform.python_version(),
+        "db_type": frappe.db.db_type,
+        "db_version": frappe.db.sql("SELECT VERSION()")[0][0],
+        "items": stock.item_count,
+        "depth": stock.depth,
+        "fan_out": stock.fan_out,
+        "leaf_warehouses": len(stock.leaves),
+        "days": stock.days,
+        "volumes": sorted(volumes),
+        "submit_sizes": list(submit_sizes),
+        "repeat": repeat,
+    }
+
+
+def compare_results(baseline, current, tolerance=1.2):
+    """Pair up matching benchmarks and flag those whose median slowed beyond `tolerance`.
+
+    Returns a list of dicts with the benchmark, params, both medians, their
+    ratio and whether it is a regression.
+    """
+
+    def key(result):
+        return result["benchmark"], json.dumps(result["params"], sort_keys=True)
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    comparison = []
+    for result in current["results"]:
+        before = baseline_results.get(key(result))
+        if not before:
+            continue
+
+        ratio = result["median"] / before["median"] if before["median"] else 0
+        comparison.append(
+            {
+                "benchmark": result["benchmark"],
+                "params": result["params"],
+                "baseline": before["median"],
+                "current": result["median"],
+                "ratio": ratio,
+                "regression": ratio > tolerance,
+            }
+        )
+
+    return comparison
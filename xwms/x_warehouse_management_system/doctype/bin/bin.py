@@ -0,0 +1,182 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt
+
+from xwms.x_warehouse_management_system.valuation import (
+    get_outgoing_rate,
+    get_valuation_methods,
+)
+
+# one form's worth of lines; larger lookups belong in the Stock Balance Report
+MAX_AVAILABILITY_PAIRS = 500
+
+
+class Bin(Document):
+    """Current stock state of one item in one warehouse.
+
+    A Bin is a materialized view of the Stock Ledger Entries for its
+    (item, warehouse) pair and is only ever written by stock postings.
+    """
+
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_unique(
+        "Bin", ["item", "warehouse"], constraint_name="unique_item_warehouse"
+    )
+
+
+def get_or_make_bin(item, warehouse):
+    bin_name = frappe.db.get_value("Bin", {"item": item, "warehouse": warehouse})
+
+    if not bin_name:
+        bin_doc = frappe.get_doc(
+            {"doctype": "Bin", "item": item, "warehouse": warehouse}
+        )
+        try:
+            bin_doc.insert(ignore_permissions=True)
+            bin_name = bin_doc.name
+        except frappe.UniqueValidationError:
+            # another transaction created the bin in the meantime
+            bin_name = frappe.db.get_value(
+                "Bin", {"item": item, "warehouse": warehouse}
+            )
+
+    return bin_name
+
+
+def get_bin_details(item, warehouse):
+    details = frappe.db.get_value(
+        "Bin",
+        {"item": item, "warehouse": warehouse},
+        ["actual_qty", "stock_value", "valuation_rate", "stock_queue"],
+        as_dict=True,
+    )
+
+    return details or frappe._dict(
+        actual_qty=0, stock_value=0, valuation_rate=0, stock_queue=None
+    )
+
+
+def update_bins_from_map(bins, changes, stock_queues=None):
+    """Apply (qty_change, value_change) per (item, warehouse) with one bulk update.
+
+    `bins` must come from `get_bin_details_map(..., for_update=True)` in the
+    same transaction, so the balances it holds are still current. FIFO pairs
+    also pass their updated queue in `stock_queues`.
+    """
+    updates = {}
+    for (item, warehouse), (qty_change, value_change) in sorted(changes.items()):
+        bin_details = bins[(item, warehouse)]
+        actual_qty = flt(bin_details.actual_qty) + qty_change
+        stock_value = flt(bin_details.stock_value) + value_change
+
+        if flt(actual_qty, 6) < 0:
+            frappe.throw(
+                f"Insufficient stock for item {item} in {warehouse}: "
+                f"this posting would leave {actual_qty} units."
+            )
+
+        updates[bin_details.name] = {
+            "actual_qty": actual_qty,
+            "stock_value": stock_value,
+            "valuation_rate": stock_value / actual_qty if actual_qty > 0 else 0,
+        }
+        if stock_queues and (item, warehouse) in stock_queues:
+            updates[bin_details.name]["stock_queue"] = stock_queues[
+                (item, warehouse)
+            ].as_json()
+
+    if updates:
+        frappe.db.bulk_update("Bin", updates, update_modified=False)
+
+
+def get_bin_details_map(pairs, for_update=False):
+    """Return bin details for many (item, warehouse) pairs with one query.
+
+    With `for_update`, missing bins are created and every bin is locked in
+    (item, warehouse) order, so concurrent postings that share a bin queue
+    up behind each other without deadlocking, while postings on other bins
+    carry on in parallel.
+    """
+    pairs = sorted(set(pairs))
+    details = {
+        pair: frappe._dict(
+            actual_qty=0, stock_value=0, valuation_rate=0, stock_queue=None
+        )
+        for pair in pairs
+    }
+
+    if not pairs:
+        return details
+
+    if for_update:
+        existing = {(row.item, row.warehouse) for row in _get_bins(pairs)}
+        for item, warehouse in pairs:
+            if (item, warehouse) not in existing:
+                get_or_make_bin(item, warehouse)
+
+    for bin_details in _get_bins(pairs, for_update=for_update):
+        details[(bin_details.item, bin_details.warehouse)] = bin_details
+
+    return details
+
+
+def _get_bins(pairs, for_update=False):
+    conditions = " OR ".join(["(item = %s AND warehouse = %s)"] * len(pairs))
+
+    return frappe.db.sql(
+        f"""
+            SELECT name, item, warehouse, actual_qty, stock_value, valuation_rate,
+                   stock_queue
+            FROM `tabBin`
+            WHERE {conditions}
+            ORDER BY item, warehouse
+            {"FOR UPDATE" if for_update else ""}
+        """,
+        [value for pair in pairs for value in pair],
+        as_dict=True,
+    )
+
+
+@frappe.whitelist()
+def get_stock_availability(pairs):
+    """Return available qty and current valuation rate for many (item, warehouse) pairs.
+
+    Bins are read with one query on their unique (item, warehouse) index,
+    so the lookup stays cheap however often forms call it. Pairs without a
+    bin have no stock. The rate is the one the next outflow is valued at.
+    """
+    frappe.has_permission("Bin", "read", throw=True)
+
+    pairs = sorted(
+        {
+            (item, warehouse)
+            for item, warehouse in frappe.parse_json(pairs) or []
+            if item and warehouse
+        }
+    )
+    if len(pairs) > MAX_AVAILABILITY_PAIRS:
+        frappe.throw(
+            f"Stock availability can be fetched for at most {MAX_AVAILABILITY_PAIRS} "
+            "item and warehouse pairs at once!"
+        )
+
+    bins = get_bin_details_map(pairs)
+    valuation_methods = get_valuation_methods(item for item, _ in pairs)
+
+    return [
+        {
+            "item": item,
+            "warehouse": warehouse,
+            "actual_qty": flt(bins[(item, warehouse)].actual_qty),
+            "valuation_rate": flt(
+                get_outgoing_rate(bins[(item, warehouse)], valuation_methods[item])
+            ),
+        }
+        for item, warehouse in pairs
+    ]
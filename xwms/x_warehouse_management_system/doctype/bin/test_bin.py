@@ -0,0 +1,148 @@
+# Copyright (c) 2025, SymonMuchemi and Contributors
+# See license.txt
+
+import frappe
+import uuid
+from frappe.tests.utils import FrappeTestCase
+from xwms.x_warehouse_management_system.doctype.bin.bin import get_stock_availability
+from xwms.x_warehouse_management_system.stock_ledger import make_sl_entries
+
+
+class TestBin(FrappeTestCase):
+    def setUp(self):
+        self.item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"BIN-TV-{uuid.uuid4().hex[:6]}",
+            "item_name": "Bin TV",
+        }).insert()
+
+        self.warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Bin Test WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+    def tearDown(self):
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
+        frappe.db.sql("DELETE FROM `tabStock Entry`")
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.sql("DELETE FROM `tabItem`")
+        frappe.db.commit()
+
+    def make_entry(self, entry_type, quantity, valuation_rate=None):
+        row = {"item": self.item.name, "quantity": quantity}
+        if valuation_rate:
+            row["valuation_rate"] = valuation_rate
+
+        warehouse_field = "to_warehouse" if entry_type == "Receipt" else "from_warehouse"
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": entry_type,
+            "posting_date": "2025-05-15",
+            warehouse_field: self.warehouse.name,
+            "items": [row]
+        }).insert()
+        doc.submit()
+        return doc
+
+    def get_bin(self):
+        return frappe.get_doc(
+            "Bin", {"item": self.item.name, "warehouse": self.warehouse.name}
+        )
+
+    def test_receipts_update_bin(self):
+        """ Test that receipts accumulate quantity and value on the bin. """
+        self.make_entry("Receipt", 5, 10000)
+        self.make_entry("Receipt", 5, 20000)
+
+        bin_doc = self.get_bin()
+        self.assertEqual(bin_doc.actual_qty, 10)
+        self.assertEqual(bin_doc.stock_value, 150000)
+        self.assertEqual(bin_doc.valuation_rate, 15000)
+
+    def test_consume_reduces_bin(self):
+        """ Test that consumption reduces the bin at the current valuation rate. """
+        self.make_entry("Receipt", 10, 12000)
+        self.make_entry("Consume", 4)
+
+        bin_doc = self.get_bin()
+        self.assertEqual(bin_doc.actual_qty, 6)
+        self.assertEqual(bin_doc.stock_value, 72000)
+        self.assertEqual(bin_doc.valuation_rate, 12000)
+
+    def test_bin_matches_ledger(self):
+        """ Test that the bin agrees with the aggregated ledger. """
+        self.make_entry("Receipt", 3, 9000)
+        self.make_entry("Receipt", 7, 11000)
+        self.make_entry("Consume", 5)
+
+        qty, value = frappe.db.sql(
+            """
+                SELECT SUM(actual_quantity), SUM(actual_quantity * valuation_rate)
+                FROM `tabStock Ledger Entry`
+                WHERE item = %s AND warehouse = %s
+            """,
+            (self.item.name, self.warehouse.name),
+        )[0]
+
+        bin_doc = self.get_bin()
+        self.assertEqual(bin_doc.actual_qty, qty)
+        self.assertAlmostEqual(bin_doc.stock_value, value, places=2)
+
+    def test_stock_availability_for_many_pairs(self):
+        """ Test that availability covers every pair, with or without a bin. """
+        self.make_entry("Receipt", 10, 12000)
+        self.make_entry("Consume", 4)
+
+        other_warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Bin Empty WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+        availability = get_stock_availability([
+            [self.item.name, self.warehouse.name],
+            [self.item.name, other_warehouse.name],
+            [self.item.name, self.warehouse.name],
+        ])
+
+        self.assertEqual(len(availability), 2)
+        by_warehouse = {row["warehouse"]: row for row in availability}
+        self.assertEqual(by_warehouse[self.warehouse.name]["actual_qty"], 6)
+        self.assertEqual(by_warehouse[self.warehouse.name]["valuation_rate"], 12000)
+        self.assertEqual(by_warehouse[other_warehouse.name]["actual_qty"], 0)
+
+    def test_consume_beyond_bin_is_refused(self):
+        """ Test that consuming more than the bin holds fails and leaves the bin as it was. """
+        self.make_entry("Receipt", 5, 10000)
+
+        with self.assertRaises(frappe.ValidationError):
+            self.make_entry("Consume", 6)
+
+        bin_doc = self.get_bin()
+        self.assertEqual(bin_doc.actual_qty, 5)
+        self.assertEqual(bin_doc.stock_value, 50000)
+
+    def test_ledger_refuses_to_leave_bin_negative(self):
+        """ Test that entries drawing one pair twice are checked against the bin together. """
+        self.make_entry("Receipt", 5, 10000)
+
+        # each draw fits on its own, together they would leave -1
+        with self.assertRaises(frappe.ValidationError):
+            make_sl_entries([
+                {
+                    "item": self.item.name,
+                    "warehouse": self.warehouse.name,
+                    "posting_date": "2025-05-16",
+                    "actual_quantity": -quantity,
+                    "valuation_rate": 10000,
+                    "voucher_type": "Stock Entry",
+                    "voucher_no": "BIN-TEST-VOUCHER",
+                }
+                for quantity in (3, 3)
+            ])
+
+        bin_doc = self.get_bin()
+        self.assertEqual(bin_doc.actual_qty, 5)
+        self.assertEqual(bin_doc.stock_value, 50000)
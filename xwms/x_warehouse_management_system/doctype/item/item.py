@@ -1,11 +1,73 @@
 # Copyright (c) 2025, SymonMuchemi and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
+from frappe.utils import flt
+
+from xwms.x_warehouse_management_system.doctype.stock_reorder_alert.stock_reorder_alert import (
+    evaluate_reorder_alerts,
+)
+from xwms.x_warehouse_management_system.doctype.warehouse.warehouse import (
+    get_warehouses_meta,
+)
+from xwms.x_warehouse_management_system.stock_balance_cache import invalidate_masters
 
 
 class Item(Document):
+    def validate(self):
+        # stored balances and queues are only valid for the method they were
+        # posted under
+        if (
+            not self.is_new()
+            and self.has_value_changed("valuation_method")
+            and frappe.db.exists("Stock Ledger Entry", {"item": self.name})
+        ):
+            frappe.throw(
+                f"Cannot change the valuation method of {self.name} once it has stock transactions!"
+            )
+
+        self.validate_reorder_levels()
+
+    def validate_reorder_levels(self):
+        warehouses_meta = get_warehouses_meta(row.warehouse for row in self.reorder_levels)
+        seen = set()
+
+        for row in self.reorder_levels:
+            if row.warehouse in seen:
+                frappe.throw(
+                    f"Reorder level for warehouse {row.warehouse} is set more than once!"
+                )
+            seen.add(row.warehouse)
+
+            # stock is only held in leaf warehouses
+            if warehouses_meta[row.warehouse].is_group:
+                frappe.throw(
+                    f"Reorder level warehouse {row.warehouse} must be a leaf node (not a group)!"
+                )
+
+            if flt(row.reorder_level) < 0 or flt(row.reorder_qty) < 0:
+                frappe.throw(
+                    f"Reorder level and quantity for warehouse {row.warehouse} cannot be negative!"
+                )
+
+    def on_update(self):
+        # re-check at once rather than at the next run; pairs whose level was
+        # removed are included so their open alerts are resolved
+        open_alert_warehouses = frappe.get_all(
+            "Stock Reorder Alert",
+            filters={"item": self.name, "status": "Open"},
+            pluck="warehouse",
+        )
+        evaluate_reorder_alerts(
+            (self.name, warehouse)
+            for warehouse in {row.warehouse for row in self.reorder_levels}
+            | set(open_alert_warehouses)
+        )
+
+    def after_rename(self, old, new, merge=False):
+        invalidate_masters()
+
     # make sure valuation rate is 0 before save
     def before_save(self):
         self.valuation_rate = 0
@@ -0,0 +1,18 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class StockClosingBalance(Document):
+    pass
+
+
+def on_doctype_update():
+    # serves reading one closing's snapshot, optionally for an item
+    frappe.db.add_index(
+        "Stock Closing Balance",
+        ["closing_date", "item", "warehouse"],
+        index_name="closing_date_item_warehouse_index",
+    )
@@ -0,0 +1,116 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, add_months, get_last_day, getdate, now_datetime, today
+
+
+class StockClosingEntry(Document):
+    def validate(self):
+        if getdate(self.closing_date) > getdate(today()):
+            frappe.throw("Closing date cannot be in the future!")
+
+        last_closing_date = get_last_closing_date()
+        if last_closing_date and getdate(self.closing_date) <= last_closing_date:
+            frappe.throw(
+                f"Stock is already closed up to {last_closing_date}. "
+                "The closing date must be after it."
+            )
+
+    def on_submit(self):
+        self.make_closing_balances()
+
+    def on_cancel(self):
+        from xwms.x_warehouse_management_system.stock_ledger_archive import is_archived
+
+        if get_last_closing_date() != getdate(self.closing_date):
+            frappe.throw("Only the latest Stock Closing Entry can be cancelled!")
+
+        if is_archived(self.closing_date):
+            frappe.throw(
+                f"The stock ledger is archived up to {self.closing_date}, "
+                "so this period cannot be reopened!"
+            )
+
+        frappe.db.delete("Stock Closing Balance", {"stock_closing_entry": self.name})
+
+    def make_closing_balances(self):
+        from xwms.x_warehouse_management_system.report.stock_balance_report.stock_balance_report import (
+            get_balances,
+        )
+
+        # the previous snapshot plus this period's ledger movements
+        previous_closing_date = get_last_closing_date(add_days(self.closing_date, -1))
+        balances = get_balances(
+            {"posting_date": self.closing_date}, closing_date=previous_closing_date
+        )
+
+        user = frappe.session.user
+        timestamp = now_datetime()
+        frappe.db.bulk_insert(
+            "Stock Closing Balance",
+            (
+                "name",
+                "creation",
+                "modified",
+                "owner",
+                "modified_by",
+                "stock_closing_entry",
+                "closing_date",
+                "item",
+                "warehouse",
+                "qty",
+                "stock_value",
+                "valuation_rate",
+            ),
+            [
+                (
+                    frappe.generate_hash(length=10),
+                    timestamp,
+                    timestamp,
+                    user,
+                    user,
+                    self.name,
+                    self.closing_date,
+                    row.item,
+                    row.warehouse,
+                    row.qty,
+                    row.stock_value,
+                    row.valuation_rate,
+                )
+                for row in balances
+            ],
+        )
+
+
+def get_last_closing_date(upto=None):
+    """Return the latest submitted closing date, optionally on or before `upto`."""
+    filters = {"docstatus": 1}
+    if upto:
+        filters["closing_date"] = ["<=", upto]
+
+    closing_date = frappe.db.get_value(
+        "Stock Closing Entry", filters, "closing_date", order_by="closing_date desc"
+    )
+
+    return getdate(closing_date) if closing_date else None
+
+
+def make_monthly_stock_closing():
+    """Close the previous month, when enabled in Stock Settings."""
+    if not frappe.db.get_single_value("Stock Settings", "auto_close_stock_periods"):
+        return
+
+    closing_date = get_last_day(add_months(today(), -1))
+    last_closing_date = get_last_closing_date()
+    if last_closing_date and last_closing_date >= closing_date:
+        return
+
+    frappe.get_doc(
+        {
+            "doctype": "Stock Closing Entry",
+            "closing_date": closing_date,
+            "remarks": "Monthly closing",
+        }
+    ).submit()
@@ -0,0 +1,94 @@
+# Copyright (c) 2025, SymonMuchemi and Contributors
+# See license.txt
+
+import frappe
+import uuid
+from frappe.tests.utils import FrappeTestCase
+from xwms.x_warehouse_management_system.report.stock_balance_report.stock_balance_report import (
+    execute,
+)
+
+
+class TestStockClosingEntry(FrappeTestCase):
+    def setUp(self):
+        self.item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"CLOSE-TV-{uuid.uuid4().hex[:6]}",
+            "item_name": "Closing TV",
+        }).insert()
+
+        self.warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Closing WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+        self.make_receipt("2025-05-10", 10, 10000)
+
+    def tearDown(self):
+        frappe.db.sql("DELETE FROM `tabStock Closing Balance`")
+        frappe.db.sql("DELETE FROM `tabStock Closing Entry`")
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
+        frappe.db.sql("DELETE FROM `tabStock Entry`")
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.sql("DELETE FROM `tabItem`")
+        frappe.db.commit()
+
+    def make_receipt(self, posting_date, quantity, valuation_rate):
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Receipt",
+            "posting_date": posting_date,
+            "to_warehouse": self.warehouse.name,
+            "items": [{
+                "item": self.item.name,
+                "quantity": quantity,
+                "valuation_rate": valuation_rate
+            }]
+        }).insert()
+        doc.submit()
+        return doc
+
+    def make_closing(self, closing_date):
+        return frappe.get_doc({
+            "doctype": "Stock Closing Entry",
+            "closing_date": closing_date
+        }).submit()
+
+    def test_closing_snapshots_balances(self):
+        """ Test that a closing stores the balance of each bin. """
+        closing = self.make_closing("2025-05-31")
+
+        balance = frappe.get_all("Stock Closing Balance", filters={
+            "stock_closing_entry": closing.name,
+            "item": self.item.name
+        }, fields=["qty", "stock_value", "valuation_rate"])
+
+        self.assertEqual(len(balance), 1)
+        self.assertEqual(balance[0].qty, 10)
+        self.assertEqual(balance[0].stock_value, 100000)
+        self.assertEqual(balance[0].valuation_rate, 10000)
+
+    def test_posting_into_closed_period_fails(self):
+        """ Test that closed periods reject new postings. """
+        self.make_closing("2025-05-31")
+
+        with self.assertRaises(frappe.ValidationError):
+            self.make_receipt("2025-05-20", 1, 10000)
+
+    def test_balance_after_closing_adds_ledger_delta(self):
+        """ Test that balances after a closing add postings made since it. """
+        self.make_closing("2025-05-31")
+        self.make_receipt("2025-06-02", 10, 20000)
+
+        columns, data = execute({
+            "item": self.item.name,
+            "warehouse": self.warehouse.name,
+            "posting_date": "2025-06-02",
+        })
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["qty"], 20)
+        self.assertEqual(data[0]["stock_value"], 300000)
+        self.assertEqual(data[0]["valuation_rate"], 15000)
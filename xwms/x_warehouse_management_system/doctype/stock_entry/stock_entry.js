@@ -1,8 +1,132 @@
 // Copyright (c) 2025, SymonMuchemi and contributors
 // For license information, please see license.txt
 
-// frappe.ui.form.on("Stock Entry", {
-// 	refresh(frm) {
+// wait for the user to pause typing before asking for availability
+const AVAILABILITY_DELAY = 300;
 
-// 	},
-// });
+frappe.ui.form.on("Stock Entry", {
+	setup(frm) {
+		frm.refresh_availability = frappe.utils.debounce(
+			() => refresh_availability(frm),
+			AVAILABILITY_DELAY
+		);
+	},
+
+	refresh(frm) {
+		const messages = {
+			Queued: [__("This entry is queued for posting in the background."), "orange"],
+			Posting: [__("This entry is being posted in the background."), "blue"],
+			Failed: [__("Background posting failed. Check the Error Log and submit again."), "red"],
+		};
+		const message = frm.doc.docstatus === 0 && messages[frm.doc.posting_status];
+
+		if (message) {
+			frm.set_intro(...message);
+		}
+
+		frm.refresh_availability();
+	},
+
+	type(frm) {
+		frm.refresh_availability();
+	},
+
+	from_warehouse(frm) {
+		frm.refresh_availability();
+	},
+
+	to_warehouse(frm) {
+		frm.refresh_availability();
+	},
+});
+
+frappe.ui.form.on("Stock Entry Details", {
+	item(frm) {
+		frm.refresh_availability();
+	},
+
+	quantity(frm) {
+		frm.refresh_availability();
+	},
+
+	items_remove(frm) {
+		frm.refresh_availability();
+	},
+});
+
+function get_availability_warehouse(frm) {
+	// outflows draw from the source warehouse; receipts show what is already there
+	return frm.doc.type === "Receipt" ? frm.doc.to_warehouse : frm.doc.from_warehouse;
+}
+
+function refresh_availability(frm) {
+	const warehouse = get_availability_warehouse(frm);
+	const rows = (frm.doc.items || []).filter((row) => row.item);
+	const request = (frm.availability_request = (frm.availability_request || 0) + 1);
+
+	if (frm.doc.docstatus !== 0 || !warehouse || !rows.length) {
+		show_availability(frm, {});
+		return;
+	}
+
+	const items = [...new Set(rows.map((row) => row.item))];
+
+	frappe
+		.call({
+			method: "xwms.x_warehouse_management_system.doctype.bin.bin.get_stock_availability",
+			args: { pairs: items.map((item) => [item, warehouse]) },
+		})
+		.then(({ message }) => {
+			// a later edit has already asked again
+			if (request !== frm.availability_request) return;
+
+			const availability = {};
+			for (const stock of message || []) {
+				availability[stock.item] = stock;
+			}
+			show_availability(frm, availability);
+		});
+}
+
+function show_availability(frm, availability) {
+	const required = {};
+
+	// virtual fields: set them on the rows directly so the form is not dirtied
+	for (const row of frm.doc.items || []) {
+		const stock = availability[row.item];
+		row.available_qty = stock ? stock.actual_qty : null;
+		row.current_valuation_rate = stock ? stock.valuation_rate : null;
+
+		if (stock) {
+			required[row.item] = (required[row.item] || 0) + flt(row.quantity);
+		}
+	}
+	frm.refresh_field("items");
+
+	const shortages =
+		frm.doc.type === "Receipt"
+			? []
+			: Object.keys(required).filter(
+					(item) => required[item] > availability[item].actual_qty
+			  );
+
+	if (shortages.length) {
+		frm.dashboard.set_headline_alert(
+			__("Not enough stock in {0} for: {1}", [
+				frappe.utils.escape_html(frm.doc.from_warehouse).bold(),
+				shortages
+					.map(
+						(item) =>
+							`${frappe.utils.escape_html(item).bold()} (${__("needs {0}, has {1}", [
+								required[item],
+								availability[item].actual_qty,
+							])})`
+					)
+					.join(", "),
+			]),
+			"red"
+		);
+	} else {
+		frm.dashboard.clear_headline();
+	}
+}
@@ -3,16 +3,87 @@
 
 import frappe
 from frappe.model.document import Document
+from frappe.utils import cint, getdate
 from datetime import datetime
+from xwms.x_warehouse_management_system.doctype.bin.bin import (
+    get_bin_details,
+    get_bin_details_map,
+)
+from xwms.x_warehouse_management_system.doctype.stock_closing_entry.stock_closing_entry import (
+    get_last_closing_date,
+)
+from xwms.x_warehouse_management_system.doctype.warehouse.warehouse import (
+    get_warehouses_meta,
+)
+from xwms.x_warehouse_management_system.instrumentation import instrumented
+from xwms.x_warehouse_management_system.stock_ledger import (
+    make_reverse_sl_entries,
+    make_sl_entries,
+)
+from xwms.x_warehouse_management_system.valuation import (
+    FIFOQueue,
+    get_outgoing_rate,
+    get_valuation_methods,
+)
+
+# seconds a background posting may run, and so hold its entries uncommitted
+QUEUED_SUBMIT_TIMEOUT = 3600
 
 
 class StockEntry(Document):
+    @frappe.whitelist()
+    def submit(self):
+        if self.should_queue_submit():
+            self.queue_submit()
+        else:
+            return self._submit()
+
+    def should_queue_submit(self):
+        if self.is_new() or self.flags.in_background_posting:
+            return False
+
+        threshold = cint(
+            frappe.db.get_single_value("Stock Settings", "queue_submit_threshold")
+        )
+        return threshold > 0 and len(self.items) > threshold
+
+    def queue_submit(self):
+        """Hand a large entry to a background worker and return straight away."""
+        self.check_permission("submit")
+        self.validate()
+
+        self.lock()
+        self.db_set("posting_status", "Queued", notify=True)
+
+        frappe.enqueue(
+            "xwms.x_warehouse_management_system.doctype.stock_entry.stock_entry.submit_queued_stock_entry",
+            queue="long",
+            timeout=QUEUED_SUBMIT_TIMEOUT,
+            enqueue_after_commit=True,
+            stock_entry=self.name,
+        )
+        frappe.msgprint(
+            f"{self.name} has {len(self.items)} lines and will be posted in the background.",
+            alert=True,
+        )
+
+    def before_submit(self):
+        self.posting_status = "Posted"
+
+    @instrumented("Stock Entry.on_submit")
     def on_submit(self):
+        sl_entries = []
+
+        # lock the bins of every (item, warehouse) pair this entry touches, in
+        # a fixed order, so the stock read below cannot change until commit
+        self.publish_posting_progress(10, "Locking stock")
+        balances = get_bin_details_map(self.get_bin_pairs(), for_update=True)
+        self.publish_posting_progress(40, "Preparing ledger entries")
+
         if self.type == "Receipt":
             for row in self.items:
-                frappe.get_doc(
+                sl_entries.append(
                     {
-                        "doctype": "Stock Ledger Entry",
                         "item": row.item,
                         "warehouse": self.to_warehouse,
                         "posting_date": self.posting_date,
@@ -20,62 +91,51 @@ class StockEntry(Document):
                         "valuation_rate": row.valuation_rate,
                         "voucher_type": "Stock Entry",
                         "voucher_no": self.name,
+                        "voucher_detail_no": row.name,
                     }
-                ).insert()
-
-        elif self.type == "Consume":
-            for row in self.items:
-                # fetch current valuation
-                valuation_rate = self.get_current_valuation_rate(
-                    row.item, self.from_warehouse
-                )
-
-                # get total available quantity
-                available_quantity = self.get_available_quantity(
-                    row.item, self.from_warehouse
                 )
 
-                if row.quantity > available_quantity:
-                    frappe.throw(
-                        f"Cannot consume {row.quantity} units of item {row.item} from {self.from_warehouse}. "
-                        f"Only {available_quantity} units available."
-                    )
+        elif self.type in ("Consume", "Transfer"):
+            valuation_methods = self.flags.valuation_methods or get_valuation_methods(
+                row.item for row in self.items
+            )
 
-                frappe.get_doc(
-                    {
-                        "doctype": "Stock Ledger Entry",
-                        "item": row.item,
-                        "warehouse": self.from_warehouse,
-                        "posting_date": self.posting_date,
-                        "actual_quantity": -row.quantity,
-                        "valuation_rate": valuation_rate,
-                        "voucher_type": "Stock Entry",
-                        "voucher_no": self.name,
-                    }
-                ).insert()
-
-        elif self.type == "Transfer":
             for row in self.items:
-                # get total available quantity
-                available_quantity = self.get_available_quantity(
-                    row.item, self.from_warehouse
-                )
+                balance = balances[(row.item, self.from_warehouse)]
+                available_quantity = balance.actual_qty
 
                 if row.quantity > available_quantity:
                     frappe.throw(
-                        f"Cannot transfer {row.quantity} units of item {row.item} from {self.from_warehouse}. "
+                        f"Cannot {self.type.lower()} {row.quantity} units of item {row.item} from {self.from_warehouse}. "
                         f"Only {available_quantity} units available."
                     )
 
                 # get valuation rate from the source warehouse
-                valuation_rate = self.get_current_valuation_rate(
-                    row.item, self.from_warehouse
+                moving_average_rate = (
+                    balance.stock_value / balance.actual_qty
+                    if balance.actual_qty > 0
+                    else 0
                 )
 
+                if valuation_methods[row.item] == "FIFO":
+                    # FIFO takes the oldest batches in the bin's queue, kept
+                    # on the balance so later rows continue where this one ends
+                    if "fifo_queue" not in balance:
+                        balance.fifo_queue = FIFOQueue(balance.stock_queue)
+                    valuation_rate = (
+                        balance.fifo_queue.remove(row.quantity, moving_average_rate)
+                        / row.quantity
+                    )
+                else:
+                    valuation_rate = moving_average_rate
+
+                # later rows of this entry must see the stock this row takes out
+                balance.actual_qty -= row.quantity
+                balance.stock_value -= row.quantity * valuation_rate
+
                 # oubound entry
-                frappe.get_doc(
+                sl_entries.append(
                     {
-                        "doctype": "Stock Ledger Entry",
                         "item": row.item,
                         "warehouse": self.from_warehouse,
                         "posting_date": self.posting_date,
@@ -83,23 +143,51 @@ class StockEntry(Document):
                         "valuation_rate": valuation_rate,
                         "voucher_type": "Stock Entry",
                         "voucher_no": self.name,
+                        "voucher_detail_no": row.name,
                     }
-                ).insert()
+                )
 
-                # inbound entry
-                frappe.get_doc(
-                    {
-                        "doctype": "Stock Ledger Entry",
-                        "item": row.item,
-                        "warehouse": self.to_warehouse,
-                        "posting_date": self.posting_date,
-                        "actual_quantity": row.quantity,
-                        "valuation_rate": valuation_rate,
-                        "voucher_type": "Stock Entry",
-                        "voucher_no": self.name,
-                    }
-                ).insert()
+                if self.type == "Transfer":
+                    # inbound entry
+                    sl_entries.append(
+                        {
+                            "item": row.item,
+                            "warehouse": self.to_warehouse,
+                            "posting_date": self.posting_date,
+                            "actual_quantity": row.quantity,
+                            "valuation_rate": valuation_rate,
+                            "voucher_type": "Stock Entry",
+                            "voucher_no": self.name,
+                            "voucher_detail_no": row.name,
+                        }
+                    )
+
+        # post every ledger entry of the voucher in one bulk write
+        self.publish_posting_progress(70, "Posting ledger entries")
+        make_sl_entries(
+            sl_entries,
+            valuation_methods=self.flags.valuation_methods,
+            warehouses_meta=self.flags.warehouses_meta,
+        )
+        self.publish_posting_progress(100, "Posted")
+
+    def on_cancel(self):
+        self.validate_posting_period()
+
+        # reverse every ledger entry of this entry in one bulk write
+        make_reverse_sl_entries(self.doctype, self.name)
 
+    def publish_posting_progress(self, percent, description):
+        if self.flags.in_background_posting:
+            frappe.publish_progress(
+                percent,
+                title="Posting Stock Entry",
+                doctype=self.doctype,
+                docname=self.name,
+                description=description,
+            )
+
+    @instrumented("Stock Entry.validate")
     def validate(self):
         # set posting_date to current date if not specified
         if not self.posting_date:
@@ -117,9 +205,17 @@ class StockEntry(Document):
         if self.posting_date > today:
             frappe.throw("Posting date cannot be in the future!")
 
+        self.validate_posting_period()
+
         if not self.items:
             frappe.throw("Please add at least one item to the Stock Entry!")
 
+        # fetch warehouse metadata once for the whole entry, unless a bulk
+        # submission already has it for the whole batch
+        warehouses_meta = self.flags.warehouses_meta or get_warehouses_meta(
+            [self.from_warehouse, self.to_warehouse]
+        )
+
         for row in self.items:
             # ensure quantity > 0
             if not row.quantity or row.quantity <= 0:
@@ -132,12 +228,10 @@ class StockEntry(Document):
                         f"To warehouse is required for receipt item - {row.item}"
                     )
                 if self.from_warehouse:
-                    frappe.thow(f"From warehouse must be blank for {row.item}")
+                    frappe.throw(f"From warehouse must be blank for {row.item}")
 
                 # ensure warehouse is a leaf
-                is_group = frappe.db.get_value(
-                    "Warehouse", self.to_warehouse, "is_group"
-                )
+                is_group = warehouses_meta[self.to_warehouse].is_group
 
                 if is_group:
                     frappe.throw(
@@ -155,12 +249,10 @@ class StockEntry(Document):
                         f"From warehouse is required for receipt item - {row.item}"
                     )
                 if self.to_warehouse:
-                    frappe.thow(f"To warehouse must be blank for {row.item}")
+                    frappe.throw(f"To warehouse must be blank for {row.item}")
 
                 # ensure warehouse is a leaf
-                is_group = frappe.db.get_value(
-                    "Warehouse", self.from_warehouse, "is_group"
-                )
+                is_group = warehouses_meta[self.from_warehouse].is_group
 
                 if is_group:
                     frappe.throw(
@@ -178,12 +270,8 @@ class StockEntry(Document):
                     )
 
                 # ensure warehouse is a leaf
-                from_wh_is_group = frappe.db.get_value(
-                    "Warehouse", self.from_warehouse, "is_group"
-                )
-                to_wh_is_group = frappe.db.get_value(
-                    "Warehouse", self.from_warehouse, "is_group"
-                )
+                from_wh_is_group = warehouses_meta[self.from_warehouse].is_group
+                to_wh_is_group = warehouses_meta[self.to_warehouse].is_group
 
                 if from_wh_is_group:
                     frappe.throw(
@@ -195,30 +283,119 @@ class StockEntry(Document):
                         f"To warehouse must be a leaf node (not a group) for item {row.item}"
                     )
 
-    def get_current_valuation_rate(self, item, warehouse):
-        # formula => valuation_rate = total_stock_value / total_stock_qty
-        result = frappe.db.sql(
-            """
-            SELECT COALESCE(SUM(actual_quantity * valuation_rate), 0) as total_value,
-                   COALESCE(SUM(actual_quantity), 0) as total_quantity
-            FROM `tabStock Ledger Entry`
-            WHERE item = %s AND warehouse = %s
-        """,
-            (item, warehouse),
-        )
-        total_value, total_quantity = result[0]
+    def validate_posting_period(self):
+        # closed periods are frozen
+        last_closing_date = get_last_closing_date()
+        if last_closing_date and getdate(self.posting_date) <= last_closing_date:
+            frappe.throw(
+                f"Stock is closed up to {last_closing_date}. "
+                "Posting date must be after the last closing date!"
+            )
+
+    def get_bin_pairs(self):
+        pairs = []
+        for row in self.items:
+            if self.from_warehouse:
+                pairs.append((row.item, self.from_warehouse))
+            if self.to_warehouse:
+                pairs.append((row.item, self.to_warehouse))
 
-        if total_quantity <= 0:
-            return 0
+        return pairs
 
-        return total_value / total_quantity
+    def get_current_valuation_rate(self, item, warehouse):
+        return get_outgoing_rate(
+            get_bin_details(item, warehouse), get_valuation_methods([item])[item]
+        )
 
     def get_available_quantity(self, item, warehouse):
-        return frappe.db.sql(
-            """
-                SELECT COALESCE(SUM(actual_quantity), 0)
-                FROM `tabStock Ledger Entry`
-                WHERE item = %s AND warehouse = %s
-            """,
-            (item, warehouse),
-        )[0][0]
+        return get_bin_details(item, warehouse).actual_qty
+
+
+def submit_queued_stock_entry(stock_entry):
+    doc = frappe.get_doc("Stock Entry", stock_entry)
+    doc.unlock()
+
+    # make the status visible before the long posting transaction starts
+    doc.db_set("posting_status", "Posting", notify=True, commit=True)
+
+    try:
+        doc.flags.in_background_posting = True
+        doc.submit()
+        frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        doc.log_error("Background Stock Entry submission failed")
+        doc.db_set("posting_status", "Failed", notify=True, commit=True)
+
+
+@frappe.whitelist()
+def bulk_submit_stock_entries(entries, chunk_size=100):
+    """Insert and submit many Stock Entries in one call.
+
+    Items and warehouses are looked up once for the whole batch and passed
+    down to every entry's validation and posting, entries are
+    committed in chunks of `chunk_size`, and a failing entry is rolled back
+    on its own. Returns one result per entry, in the order given.
+    """
+    frappe.has_permission("Stock Entry", "submit", throw=True)
+
+    entries = frappe.parse_json(entries)
+    chunk_size = cint(chunk_size) or 100
+
+    # one lookup each for every item and warehouse in the batch, handed to
+    # every entry so neither validation nor posting looks them up again
+    items = {row.get("item") for entry in entries for row in entry.get("items") or []}
+    valuation_methods = {
+        item: valuation_method or "Moving Average"
+        for item, valuation_method in frappe.get_all(
+            "Item",
+            filters={"name": ["in", list(items)]},
+            fields=["name", "valuation_method"],
+            as_list=True,
+        )
+    }
+    warehouses_meta = get_warehouses_meta(
+        {
+            warehouse
+            for entry in entries
+            for warehouse in (entry.get("from_warehouse"), entry.get("to_warehouse"))
+            if warehouse
+        }
+    )
+
+    results = []
+    for start in range(0, len(entries), chunk_size):
+        for idx, entry in enumerate(entries[start : start + chunk_size], start):
+            missing = [
+                row.get("item")
+                for row in entry.get("items") or []
+                if row.get("item") and row.get("item") not in valuation_methods
+            ] + [
+                entry.get(fieldname)
+                for fieldname in ("from_warehouse", "to_warehouse")
+                if entry.get(fieldname) and not warehouses_meta[entry.get(fieldname)]
+            ]
+            if missing:
+                error = f"Not found: {', '.join(missing)}"
+                results.append({"index": idx, "status": "Failed", "error": error})
+                continue
+
+            frappe.db.savepoint("bulk_stock_entry")
+            try:
+                doc = frappe.get_doc({**entry, "doctype": "Stock Entry"})
+                # links were checked for the whole batch above
+                doc.flags.ignore_links = True
+                doc.flags.valuation_methods = valuation_methods
+                doc.flags.warehouses_meta = warehouses_meta
+                doc.insert()
+                doc.submit()
+                status = "Queued" if doc.posting_status == "Queued" else "Submitted"
+                results.append({"index": idx, "status": status, "name": doc.name})
+            except Exception as e:
+                frappe.db.rollback(save_point="bulk_stock_entry")
+                frappe.clear_messages()
+                results.append({"index": idx, "status": "Failed", "error": str(e)})
+
+        frappe.db.commit()
+
+    return results
@@ -3,8 +3,10 @@
 
 import frappe
 import uuid
+from unittest.mock import patch
 from frappe.tests.utils import FrappeTestCase
 from frappe.utils import add_days, today
+from .stock_entry import StockEntry, bulk_submit_stock_entries, submit_queued_stock_entry
 
 
 
@@ -26,7 +28,10 @@ class TestStockEntry(FrappeTestCase):
         }).insert()
     
     def tearDown(self):
+        frappe.db.set_single_value("Stock Settings", "queue_submit_threshold", 0)
+        frappe.db.sql("DELETE FROM `tabError Log` WHERE reference_doctype = 'Stock Entry'")
         frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
         frappe.db.sql("DELETE FROM `tabStock Entry`")
         frappe.db.sql("DELETE FROM `tabWarehouse`")
         frappe.db.sql("DELETE FROM `tabItem`")
@@ -433,3 +438,359 @@ class TestStockEntry(FrappeTestCase):
         doc.submit()
 
         self.assertEqual(str(doc.posting_date), today())
+
+    def test_ledger_entries_carry_running_balance(self):
+        """ Test that each ledger entry stores the balance after it posts. """
+        receipt = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Receipt",
+            "to_warehouse": self.warehouse.name,
+            "posting_date": "2025-05-01",
+            "items": [{
+                "item": self.item.name,
+                "quantity": 10,
+                "valuation_rate": 10000
+            }]
+        }).insert()
+        receipt.submit()
+
+        consume = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Consume",
+            "from_warehouse": self.warehouse.name,
+            "posting_date": "2025-05-02",
+            "items": [{
+                "item": self.item.name,
+                "quantity": 4
+            }]
+        }).insert()
+        consume.submit()
+
+        sle = frappe.get_all("Stock Ledger Entry", filters={
+            "voucher_no": consume.name
+        }, fields=["qty_after_transaction", "stock_value_after", "valuation_rate_after"])
+
+        self.assertEqual(len(sle), 1)
+        self.assertEqual(sle[0].qty_after_transaction, 6)
+        self.assertEqual(sle[0].stock_value_after, 60000)
+        self.assertEqual(sle[0].valuation_rate_after, 10000)
+
+    def test_repeated_item_rows_share_available_stock(self):
+        """ Test that repeated rows of one item are checked against the same stock. """
+        receipt = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Receipt",
+            "to_warehouse": self.warehouse.name,
+            "posting_date": "2025-05-01",
+            "items": [{
+                "item": self.item.name,
+                "quantity": 5,
+                "valuation_rate": 10000
+            }]
+        }).insert()
+        receipt.submit()
+
+        with self.assertRaises(frappe.ValidationError):
+            consume = frappe.get_doc({
+                "doctype": "Stock Entry",
+                "type": "Consume",
+                "from_warehouse": self.warehouse.name,
+                "posting_date": "2025-05-02",
+                "items": [
+                    {"item": self.item.name, "quantity": 3},
+                    {"item": self.item.name, "quantity": 3}
+                ]
+            }).insert()
+            consume.submit()
+
+    def test_bulk_submit_reports_each_entry(self):
+        """ Test that bulk submission returns a result per entry and isolates failures. """
+        results = bulk_submit_stock_entries([
+            {
+                "type": "Receipt",
+                "to_warehouse": self.warehouse.name,
+                "posting_date": "2025-05-15",
+                "items": [{"item": self.item.name, "quantity": 5, "valuation_rate": 10000}]
+            },
+            {
+                "type": "Consume",
+                "from_warehouse": self.warehouse.name,
+                "posting_date": "2025-05-16",
+                "items": [{"item": self.item.name, "quantity": 50}]
+            },
+            {
+                "type": "Receipt",
+                "to_warehouse": self.warehouse.name,
+                "posting_date": "2025-05-15",
+                "items": [{"item": "NO-SUCH-ITEM", "quantity": 1, "valuation_rate": 100}]
+            }
+        ])
+
+        self.assertEqual([r["status"] for r in results], ["Submitted", "Failed", "Failed"])
+        self.assertEqual(
+            frappe.db.get_value("Stock Entry", results[0]["name"], "docstatus"), 1
+        )
+        self.assertEqual(
+            frappe.db.count("Stock Ledger Entry", {"item": self.item.name}), 1
+        )
+
+    def test_cancel_reverses_ledger_entries(self):
+        """ Test that cancelling posts reversing entries and restores the bin. """
+        receipt = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Receipt",
+            "to_warehouse": self.warehouse.name,
+            "posting_date": "2025-05-01",
+            "items": [{
+                "item": self.item.name,
+                "quantity": 10,
+                "valuation_rate": 10000
+            }]
+        }).insert()
+        receipt.submit()
+
+        consume = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Consume",
+            "from_warehouse": self.warehouse.name,
+            "posting_date": "2025-05-02",
+            "items": [{
+                "item": self.item.name,
+                "quantity": 4
+            }]
+        }).insert()
+        consume.submit()
+        consume.cancel()
+
+        sle = frappe.get_all("Stock Ledger Entry", filters={
+            "voucher_no": consume.name
+        }, fields=["actual_quantity", "valuation_rate", "is_cancelled", "qty_after_transaction"])
+
+        self.assertEqual(len(sle), 2)
+        self.assertEqual(sorted(s.actual_quantity for s in sle), [-4, 4])
+        self.assertTrue(all(s.is_cancelled for s in sle))
+        self.assertTrue(all(s.valuation_rate == 10000 for s in sle))
+
+        bin_details = frappe.db.get_value(
+            "Bin",
+            {"item": self.item.name, "warehouse": self.warehouse.name},
+            ["actual_qty", "stock_value"],
+            as_dict=True
+        )
+        self.assertEqual(bin_details.actual_qty, 10)
+        self.assertEqual(bin_details.stock_value, 100000)
+
+        # cancelling a receipt whose stock has since been consumed would
+        # leave the bin negative
+        consume = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Consume",
+            "from_warehouse": self.warehouse.name,
+            "posting_date": "2025-05-03",
+            "items": [{
+                "item": self.item.name,
+                "quantity": 1
+            }]
+        }).insert()
+        consume.submit()
+
+        with self.assertRaises(frappe.ValidationError):
+            receipt.cancel()
+
+    def test_fifo_item_consumes_oldest_batches(self):
+        """ Test that a FIFO item issues stock at the rates of its oldest batches. """
+        item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"TEST-FIFO-{uuid.uuid4().hex[:6]}",
+            "item_name": "Test FIFO TV",
+            "valuation_method": "FIFO"
+        }).insert()
+
+        for posting_date, valuation_rate in (("2025-05-01", 100), ("2025-05-02", 200)):
+            frappe.get_doc({
+                "doctype": "Stock Entry",
+                "type": "Receipt",
+                "to_warehouse": self.warehouse.name,
+                "posting_date": posting_date,
+                "items": [{
+                    "item": item.name,
+                    "quantity": 5,
+                    "valuation_rate": valuation_rate
+                }]
+            }).insert().submit()
+
+        consume = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Consume",
+            "from_warehouse": self.warehouse.name,
+            "posting_date": "2025-05-03",
+            "items": [
+                {"item": item.name, "quantity": 4},
+                {"item": item.name, "quantity": 2}
+            ]
+        }).insert()
+        consume.submit()
+
+        rates = frappe.get_all("Stock Ledger Entry", filters={
+            "voucher_no": consume.name
+        }, order_by="creation asc", pluck="valuation_rate")
+
+        # the first row takes 4 of the 100 batch, the second the last 1 @ 100
+        # and 1 @ 200
+        self.assertEqual(rates, [100, 150])
+
+        bin_details = frappe.db.get_value(
+            "Bin",
+            {"item": item.name, "warehouse": self.warehouse.name},
+            ["actual_qty", "stock_value", "stock_queue"],
+            as_dict=True
+        )
+        self.assertEqual(bin_details.actual_qty, 4)
+        self.assertEqual(bin_details.stock_value, 800)
+        self.assertEqual(frappe.parse_json(bin_details.stock_queue), [[4, 200]])
+
+    def test_fifo_cancelled_receipt_takes_back_its_own_batch(self):
+        """ Test that cancelling a FIFO receipt removes its batch rather than the oldest one. """
+        item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"TEST-FIFO-{uuid.uuid4().hex[:6]}",
+            "item_name": "Test FIFO TV",
+            "valuation_method": "FIFO"
+        }).insert()
+
+        receipts = [
+            frappe.get_doc({
+                "doctype": "Stock Entry",
+                "type": "Receipt",
+                "to_warehouse": self.warehouse.name,
+                "posting_date": posting_date,
+                "items": [{
+                    "item": item.name,
+                    "quantity": 5,
+                    "valuation_rate": valuation_rate
+                }]
+            }).insert()
+            for posting_date, valuation_rate in (("2025-05-01", 100), ("2025-05-02", 200))
+        ]
+        for receipt in receipts:
+            receipt.submit()
+
+        receipts[1].cancel()
+
+        bin_details = frappe.db.get_value(
+            "Bin",
+            {"item": item.name, "warehouse": self.warehouse.name},
+            ["actual_qty", "stock_value", "stock_queue"],
+            as_dict=True
+        )
+        self.assertEqual(bin_details.actual_qty, 5)
+        self.assertEqual(bin_details.stock_value, 500)
+        self.assertEqual(frappe.parse_json(bin_details.stock_queue), [[5, 100]])
+
+    def make_queued_entry(self, entry_type, quantities, valuation_rate=None):
+        """Save a multi-line entry and submit it past the queue threshold."""
+        frappe.db.set_single_value("Stock Settings", "queue_submit_threshold", 1)
+
+        warehouse_field = "to_warehouse" if entry_type == "Receipt" else "from_warehouse"
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": entry_type,
+            "posting_date": "2025-05-15",
+            warehouse_field: self.warehouse.name,
+            "items": [
+                {"item": self.item.name, "quantity": quantity, "valuation_rate": valuation_rate}
+                for quantity in quantities
+            ]
+        }).insert()
+
+        with patch("frappe.enqueue") as enqueue:
+            doc.submit()
+
+        return doc, enqueue
+
+    def test_large_entry_is_queued_for_background_posting(self):
+        """ Test that entries above the threshold are queued and posted by the job. """
+        doc, enqueue = self.make_queued_entry("Receipt", [2, 3], 10000)
+
+        enqueue.assert_called_once()
+        self.assertEqual(enqueue.call_args.kwargs["stock_entry"], doc.name)
+        self.assertEqual(
+            tuple(frappe.db.get_value("Stock Entry", doc.name, ["docstatus", "posting_status"])),
+            (0, "Queued"),
+        )
+
+        # the job shows the entry as posting while it runs
+        statuses = []
+        before_submit = StockEntry.before_submit
+
+        def record_status(entry):
+            statuses.append(frappe.db.get_value("Stock Entry", entry.name, "posting_status"))
+            before_submit(entry)
+
+        with patch.object(StockEntry, "before_submit", record_status):
+            submit_queued_stock_entry(doc.name)
+
+        self.assertEqual(statuses, ["Posting"])
+        self.assertEqual(
+            tuple(frappe.db.get_value("Stock Entry", doc.name, ["docstatus", "posting_status"])),
+            (1, "Posted"),
+        )
+        self.assertEqual(
+            frappe.db.get_value(
+                "Bin", {"item": self.item.name, "warehouse": self.warehouse.name}, "actual_qty"
+            ),
+            5,
+        )
+
+    def test_small_entry_is_submitted_directly(self):
+        """ Test that entries at or below the threshold are posted straight away. """
+        frappe.db.set_single_value("Stock Settings", "queue_submit_threshold", 2)
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Receipt",
+            "posting_date": "2025-05-15",
+            "to_warehouse": self.warehouse.name,
+            "items": [
+                {"item": self.item.name, "quantity": 2, "valuation_rate": 10000},
+                {"item": self.item.name, "quantity": 3, "valuation_rate": 10000}
+            ]
+        }).insert()
+
+        with patch("frappe.enqueue") as enqueue:
+            doc.submit()
+
+        enqueue.assert_not_called()
+        self.assertEqual(doc.docstatus, 1)
+        self.assertEqual(doc.posting_status, "Posted")
+
+    def test_failed_background_posting_is_rolled_back_and_logged(self):
+        """ Test that a queued entry that fails to post is rolled back, logged and marked failed. """
+        receipt = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Receipt",
+            "posting_date": "2025-05-01",
+            "to_warehouse": self.warehouse.name,
+            "items": [{"item": self.item.name, "quantity": 5, "valuation_rate": 10000}]
+        }).insert()
+        receipt.submit()
+
+        # stock is only checked when the job posts, so this queues fine
+        doc, _ = self.make_queued_entry("Consume", [3, 3])
+        submit_queued_stock_entry(doc.name)
+
+        self.assertEqual(
+            tuple(frappe.db.get_value("Stock Entry", doc.name, ["docstatus", "posting_status"])),
+            (0, "Failed"),
+        )
+        self.assertFalse(frappe.db.exists("Stock Ledger Entry", {"voucher_no": doc.name}))
+        self.assertTrue(
+            frappe.db.exists(
+                "Error Log", {"reference_doctype": "Stock Entry", "reference_name": doc.name}
+            )
+        )
+        self.assertEqual(
+            frappe.db.get_value(
+                "Bin", {"item": self.item.name, "warehouse": self.warehouse.name}, "actual_qty"
+            ),
+            5,
+        )
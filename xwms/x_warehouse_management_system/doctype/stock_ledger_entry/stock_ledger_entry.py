@@ -1,9 +1,79 @@
 # Copyright (c) 2025, SymonMuchemi and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
+from frappe.utils import flt
 
 
 class StockLedgerEntry(Document):
-	pass
+    def before_insert(self):
+        self.set_running_balance()
+
+    def set_running_balance(self):
+        # carry the balance forward from the entry this one posts after
+        previous_sle = get_previous_sle(self.item, self.warehouse, self.posting_date)
+
+        self.qty_after_transaction = (
+            flt(previous_sle.qty_after_transaction) + self.actual_quantity
+        )
+        self.stock_value_after = flt(previous_sle.stock_value_after) + (
+            self.actual_quantity * flt(self.valuation_rate)
+        )
+        self.valuation_rate_after = (
+            self.stock_value_after / self.qty_after_transaction
+            if self.qty_after_transaction > 0
+            else 0
+        )
+
+
+def get_previous_sle(item, warehouse, posting_date, for_update=False):
+    """Return the latest ledger entry for the pair posted on or before `posting_date`.
+
+    Posting paths pass `for_update` so the read sees the latest committed
+    entry rather than the transaction's snapshot.
+    """
+    previous_sle = frappe.db.sql(
+        f"""
+            SELECT qty_after_transaction, stock_value_after, valuation_rate_after,
+                   stock_queue
+            FROM `tabStock Ledger Entry`
+            WHERE item = %s AND warehouse = %s AND posting_date <= %s
+            ORDER BY posting_date DESC, creation DESC, name DESC
+            LIMIT 1
+            {"FOR UPDATE" if for_update else ""}
+        """,
+        (item, warehouse, posting_date),
+        as_dict=True,
+    )
+
+    return previous_sle[0] if previous_sle else frappe._dict()
+
+
+def on_doctype_update():
+    # (item, warehouse, posting_date, creation) serves every per-bin lookup:
+    # get_previous_sle, the bin-driven latest-entry subquery in Stock Balance
+    # Report and the item/warehouse/date filters in Stock Ledger Report
+    frappe.db.add_index(
+        "Stock Ledger Entry",
+        ["item", "warehouse", "posting_date", "creation"],
+        index_name="item_warehouse_posting_date_index",
+    )
+
+    # (posting_date, creation) serves date-range runs of Stock Ledger Report
+    # that filter on neither item nor warehouse, and their ORDER BY
+    frappe.db.add_index(
+        "Stock Ledger Entry",
+        ["posting_date", "creation"],
+        index_name="posting_date_creation_index",
+    )
+
+    # (voucher_no) serves fetching all ledger entries of one Stock Entry
+    frappe.db.add_index(
+        "Stock Ledger Entry", ["voucher_no"], index_name="voucher_no_index"
+    )
+
+    # (creation) serves the reorder alert job's scan past its high-water mark
+    frappe.db.add_index(
+        "Stock Ledger Entry", ["creation"], index_name="creation_index"
+    )
@@ -1,9 +1,63 @@
 # Copyright (c) 2025, SymonMuchemi and Contributors
 # See license.txt
 
-# import frappe
+import frappe
+import uuid
 from frappe.tests.utils import FrappeTestCase
 
 
 class TestStockLedgerEntry(FrappeTestCase):
-	pass
+    def setUp(self):
+        self.item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"SLE-TV-{uuid.uuid4().hex[:6]}",
+            "item_name": "SLE TV",
+        }).insert()
+
+        self.warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"SLE WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+    def tearDown(self):
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
+        frappe.db.sql("DELETE FROM `tabStock Entry`")
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.sql("DELETE FROM `tabItem`")
+        frappe.db.commit()
+
+    def test_bulk_inserted_entries_carry_standard_fields(self):
+        """ Test that bulk-inserted entries get a name, owner and timestamps like saved documents. """
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Receipt",
+            "posting_date": "2025-05-15",
+            "to_warehouse": self.warehouse.name,
+            "items": [
+                {"item": self.item.name, "quantity": 2, "valuation_rate": 100},
+                {"item": self.item.name, "quantity": 3, "valuation_rate": 200}
+            ]
+        }).insert()
+        doc.submit()
+
+        entries = frappe.get_all(
+            "Stock Ledger Entry",
+            filters={"voucher_no": doc.name},
+            fields=["name", "owner", "modified_by", "creation", "modified", "qty_after_transaction"],
+            order_by="creation asc",
+        )
+
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(len({entry.name for entry in entries}), 2)
+        for entry in entries:
+            self.assertTrue(entry.name)
+            self.assertEqual(entry.owner, frappe.session.user)
+            self.assertEqual(entry.modified_by, frappe.session.user)
+            self.assertTrue(entry.creation)
+            self.assertEqual(entry.modified, entry.creation)
+
+        # entries of one voucher keep the order they were posted in
+        self.assertLess(entries[0].creation, entries[1].creation)
+        self.assertEqual([entry.qty_after_transaction for entry in entries], [2, 5])
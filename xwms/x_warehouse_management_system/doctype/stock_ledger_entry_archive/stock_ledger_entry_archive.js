@@ -0,0 +1,8 @@
+// Copyright (c) 2025, SymonMuchemi and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Stock Ledger Entry Archive", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,23 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class StockLedgerEntryArchive(Document):
+    pass
+
+
+def on_doctype_update():
+    # the archive is read like the ledger, by pair and date or by date range
+    frappe.db.add_index(
+        "Stock Ledger Entry Archive",
+        ["item", "warehouse", "posting_date", "creation"],
+        index_name="item_warehouse_posting_date_index",
+    )
+    frappe.db.add_index(
+        "Stock Ledger Entry Archive",
+        ["posting_date", "creation"],
+        index_name="posting_date_creation_index",
+    )
@@ -0,0 +1,191 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+from datetime import timedelta
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, get_datetime, now_datetime
+
+from xwms.x_warehouse_management_system.doctype.bin.bin import get_bin_details_map
+
+EVALUATE_BATCH_SIZE = 500
+# the mark is the newest entry a run saw; entries stamped a little before it
+# but committed just after it (or by a host whose clock runs slightly behind)
+# are picked up by re-reading this much before it
+HIGH_WATER_LOOKBACK = timedelta(minutes=1)
+
+
+class StockReorderAlert(Document):
+    """An (item, warehouse) pair whose stock fell to its reorder level."""
+
+    pass
+
+
+def on_doctype_update():
+    # serves finding the open alert of each evaluated pair
+    frappe.db.add_index(
+        "Stock Reorder Alert",
+        ["item", "warehouse", "status"],
+        index_name="item_warehouse_status_index",
+    )
+
+
+def process_reorder_alerts():
+    """Re-evaluate the pairs with reorder levels the ledger touched since the last run.
+
+    Each run's high-water mark is the creation time of the newest ledger
+    entry it read, kept in Stock Settings; the next run only reads entries
+    created after it. The first run evaluates every pair that has a reorder
+    level.
+    """
+    checked_upto = frappe.db.get_single_value("Stock Settings", "reorder_alerts_checked_upto")
+
+    if checked_upto:
+        touched = frappe.db.sql(
+            """
+                SELECT sle.item, sle.warehouse, MAX(sle.creation)
+                FROM `tabStock Ledger Entry` sle
+                INNER JOIN `tabItem Reorder Level` level
+                    ON level.parent = sle.item
+                    AND level.parenttype = 'Item'
+                    AND level.warehouse = sle.warehouse
+                WHERE sle.creation > %s
+                GROUP BY sle.item, sle.warehouse
+            """,
+            get_datetime(checked_upto) - HIGH_WATER_LOOKBACK,
+        )
+        pairs = [(item, warehouse) for item, warehouse, _ in touched]
+        high_water = max(
+            [get_datetime(checked_upto), *(creation for _, _, creation in touched)]
+        )
+    else:
+        pairs = frappe.db.sql(
+            """
+                SELECT DISTINCT parent, warehouse
+                FROM `tabItem Reorder Level`
+                WHERE parenttype = 'Item'
+            """
+        )
+        high_water = (
+            frappe.db.sql("SELECT MAX(creation) FROM `tabStock Ledger Entry`")[0][0]
+            or now_datetime()
+        )
+
+    evaluate_reorder_alerts(pairs)
+    frappe.db.set_single_value("Stock Settings", "reorder_alerts_checked_upto", high_water)
+
+
+def evaluate_reorder_alerts(pairs):
+    """Raise, refresh or resolve the reorder alert of every (item, warehouse) pair.
+
+    A pair is low once its bin's quantity is at or below its reorder level.
+    New alerts are inserted and changed ones updated with one bulk write per
+    batch of pairs; pairs no longer low, or without a reorder level, have
+    their open alert resolved.
+    """
+    pairs = sorted(set(pairs))
+    for start in range(0, len(pairs), EVALUATE_BATCH_SIZE):
+        evaluate_batch(pairs[start : start + EVALUATE_BATCH_SIZE])
+
+
+def evaluate_batch(pairs):
+    conditions = " OR ".join(["(item = %s AND warehouse = %s)"] * len(pairs))
+    level_conditions = " OR ".join(["(parent = %s AND warehouse = %s)"] * len(pairs))
+    values = [value for pair in pairs for value in pair]
+
+    levels = {
+        (row.item, row.warehouse): row
+        for row in frappe.db.sql(
+            f"""
+                SELECT parent AS item, warehouse, reorder_level, reorder_qty
+                FROM `tabItem Reorder Level`
+                WHERE parenttype = 'Item'
+                    AND ({level_conditions})
+            """,
+            values,
+            as_dict=True,
+        )
+    }
+    open_alerts = {
+        (row.item, row.warehouse): row
+        for row in frappe.db.sql(
+            f"""
+                SELECT name, item, warehouse, actual_qty, reorder_level, reorder_qty
+                FROM `tabStock Reorder Alert`
+                WHERE status = 'Open' AND ({conditions})
+            """,
+            values,
+            as_dict=True,
+        )
+    }
+    bins = get_bin_details_map(pairs)
+
+    timestamp = now_datetime()
+    new_alerts = []
+    updates = {}
+
+    for pair in pairs:
+        level = levels.get(pair)
+        alert = open_alerts.get(pair)
+        actual_qty = flt(bins[pair].actual_qty)
+        is_low = bool(level) and actual_qty <= flt(level.reorder_level)
+
+        if is_low and not alert:
+            new_alerts.append((pair, actual_qty, level))
+
+        elif is_low:
+            current = {
+                "actual_qty": actual_qty,
+                "reorder_level": flt(level.reorder_level),
+                "reorder_qty": flt(level.reorder_qty),
+            }
+            if any(flt(alert[field]) != value for field, value in current.items()):
+                updates[alert.name] = current
+
+        elif alert:
+            updates[alert.name] = {
+                "status": "Resolved",
+                "actual_qty": actual_qty,
+                "resolved_on": timestamp,
+            }
+
+    if updates:
+        frappe.db.bulk_update("Stock Reorder Alert", updates)
+
+    if new_alerts:
+        user = frappe.session.user
+        frappe.db.bulk_insert(
+            "Stock Reorder Alert",
+            (
+                "name",
+                "creation",
+                "modified",
+                "owner",
+                "modified_by",
+                "item",
+                "warehouse",
+                "status",
+                "actual_qty",
+                "reorder_level",
+                "reorder_qty",
+                "raised_on",
+            ),
+            [
+                (
+                    frappe.generate_hash(length=10),
+                    timestamp,
+                    timestamp,
+                    user,
+                    user,
+                    item,
+                    warehouse,
+                    "Open",
+                    actual_qty,
+                    flt(level.reorder_level),
+                    flt(level.reorder_qty),
+                    timestamp,
+                )
+                for (item, warehouse), actual_qty, level in new_alerts
+            ],
+        )
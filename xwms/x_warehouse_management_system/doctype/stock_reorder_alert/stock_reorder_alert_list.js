@@ -0,0 +1,10 @@
+// Copyright (c) 2025, SymonMuchemi and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Stock Reorder Alert"] = {
+	get_indicator(doc) {
+		return doc.status === "Open"
+			? [__("Open"), "red", "status,=,Open"]
+			: [__("Resolved"), "green", "status,=,Resolved"];
+	},
+};
@@ -0,0 +1,105 @@
+# Copyright (c) 2025, SymonMuchemi and Contributors
+# See license.txt
+
+import frappe
+import uuid
+from frappe.tests.utils import FrappeTestCase
+from xwms.x_warehouse_management_system.doctype.stock_reorder_alert.stock_reorder_alert import (
+    process_reorder_alerts,
+)
+
+
+class TestStockReorderAlert(FrappeTestCase):
+    def setUp(self):
+        self.warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Reorder WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+        self.item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"REORDER-TV-{uuid.uuid4().hex[:6]}",
+            "item_name": "Reorder TV",
+            "reorder_levels": [
+                {"warehouse": self.warehouse.name, "reorder_level": 5, "reorder_qty": 20}
+            ]
+        }).insert()
+
+    def tearDown(self):
+        frappe.db.set_single_value("Stock Settings", "reorder_alerts_checked_upto", None)
+        frappe.db.sql("DELETE FROM `tabStock Reorder Alert`")
+        frappe.db.sql("DELETE FROM `tabItem Reorder Level`")
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
+        frappe.db.sql("DELETE FROM `tabStock Entry`")
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.sql("DELETE FROM `tabItem`")
+        frappe.db.commit()
+
+    def make_entry(self, entry_type, quantity, valuation_rate=None):
+        row = {"item": self.item.name, "quantity": quantity}
+        if valuation_rate:
+            row["valuation_rate"] = valuation_rate
+
+        warehouse_field = "to_warehouse" if entry_type == "Receipt" else "from_warehouse"
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": entry_type,
+            "posting_date": "2025-05-15",
+            warehouse_field: self.warehouse.name,
+            "items": [row]
+        }).insert()
+        doc.submit()
+        return doc
+
+    def get_alerts(self):
+        return frappe.get_all(
+            "Stock Reorder Alert",
+            filters={"item": self.item.name},
+            fields=["status", "actual_qty", "reorder_qty"],
+            order_by="creation",
+        )
+
+    def test_alerts_follow_stock(self):
+        """ Test that alerts are raised at the reorder level and resolved above it. """
+        # no stock yet, so saving the item raises an alert straight away
+        self.assertEqual([alert.status for alert in self.get_alerts()], ["Open"])
+
+        self.make_entry("Receipt", 10, 1000)
+        process_reorder_alerts()
+        self.assertEqual([alert.status for alert in self.get_alerts()], ["Resolved"])
+
+        self.make_entry("Consume", 6)
+        process_reorder_alerts()
+        alerts = self.get_alerts()
+        self.assertEqual([alert.status for alert in alerts], ["Resolved", "Open"])
+        self.assertEqual(alerts[1].actual_qty, 4)
+        self.assertEqual(alerts[1].reorder_qty, 20)
+
+    def test_only_touched_pairs_are_evaluated(self):
+        """ Test that a run skips pairs the ledger has not touched since the last one. """
+        self.make_entry("Receipt", 10, 1000)
+        process_reorder_alerts()
+        # let the receipt age past the next run's look-back margin
+        frappe.db.sql(
+            """
+                UPDATE `tabStock Ledger Entry`
+                SET creation = creation - INTERVAL 1 DAY
+                WHERE item = %s
+            """,
+            self.item.name,
+        )
+
+        # raise the level behind the job's back; nothing posted, nothing re-checked
+        frappe.db.set_value(
+            "Item Reorder Level", {"parent": self.item.name}, "reorder_level", 50
+        )
+        process_reorder_alerts()
+        self.assertEqual([alert.status for alert in self.get_alerts()], ["Resolved"])
+
+        self.make_entry("Consume", 1)
+        process_reorder_alerts()
+        self.assertEqual(
+            [alert.status for alert in self.get_alerts()], ["Resolved", "Open"]
+        )
@@ -0,0 +1,306 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, flt, getdate, now_datetime
+
+from xwms.x_warehouse_management_system.doctype.bin.bin import get_bin_details_map
+from xwms.x_warehouse_management_system.doctype.stock_ledger_entry.stock_ledger_entry import (
+    get_previous_sle,
+)
+from xwms.x_warehouse_management_system.stock_balance_cache import invalidate_pairs
+from xwms.x_warehouse_management_system.valuation import FIFOQueue, get_valuation_methods
+
+REPOST_BATCH_SIZE = 50
+
+
+class StockRepostEntry(Document):
+    """A queued recomputation of one (item, warehouse) ledger from a date onwards."""
+
+    pass
+
+
+def queue_repost(pairs):
+    """Queue (item, warehouse, posting_date) triples for reposting.
+
+    A pair that is already queued keeps its single entry, moved back to the
+    earliest date asked for, so each pair is reposted once per batch.
+    """
+    earliest = {}
+    for item, warehouse, posting_date in pairs:
+        posting_date = getdate(posting_date)
+        key = (item, warehouse)
+        if key not in earliest or posting_date < earliest[key]:
+            earliest[key] = posting_date
+
+    if not earliest:
+        return
+
+    queued = frappe.get_all(
+        "Stock Repost Entry",
+        filters={
+            "status": "Queued",
+            "item": ["in", list({item for item, _ in earliest})],
+        },
+        fields=["name", "item", "warehouse", "posting_date"],
+    )
+
+    for entry in queued:
+        posting_date = earliest.pop((entry.item, entry.warehouse), None)
+        if posting_date and posting_date < getdate(entry.posting_date):
+            frappe.db.set_value(
+                "Stock Repost Entry", entry.name, "posting_date", posting_date
+            )
+
+    if earliest:
+        user = frappe.session.user
+        timestamp = now_datetime()
+        frappe.db.bulk_insert(
+            "Stock Repost Entry",
+            (
+                "name",
+                "creation",
+                "modified",
+                "owner",
+                "modified_by",
+                "item",
+                "warehouse",
+                "posting_date",
+                "status",
+            ),
+            [
+                (
+                    frappe.generate_hash(length=10),
+                    timestamp,
+                    timestamp,
+                    user,
+                    user,
+                    item,
+                    warehouse,
+                    posting_date,
+                    "Queued",
+                )
+                for (item, warehouse), posting_date in earliest.items()
+            ],
+        )
+
+    frappe.enqueue(
+        "xwms.x_warehouse_management_system.doctype.stock_repost_entry.stock_repost_entry.process_repost_queue",
+        queue="long",
+        job_id="xwms_process_repost_queue",
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def process_repost_queue():
+    """Repost queued pairs in batches, earliest date first, until none are left.
+
+    Each entry is claimed as "In Progress" in its own commit before it is
+    reposted, and its date read back after the claim, so a concurrent
+    `queue_repost` for the same pair queues a fresh entry instead of moving
+    the date of one already being reposted.
+    """
+    while True:
+        entries = frappe.get_all(
+            "Stock Repost Entry",
+            filters={"status": "Queued"},
+            pluck="name",
+            order_by="posting_date asc, creation asc",
+            limit=REPOST_BATCH_SIZE,
+        )
+
+        if not entries:
+            break
+
+        for name in entries:
+            frappe.db.set_value("Stock Repost Entry", name, "status", "In Progress")
+            frappe.db.commit()
+            entry = frappe.db.get_value(
+                "Stock Repost Entry",
+                name,
+                ["item", "warehouse", "posting_date"],
+                as_dict=True,
+            )
+
+            try:
+                repost_pair(entry.item, entry.warehouse, entry.posting_date)
+                frappe.db.set_value(
+                    "Stock Repost Entry", name, "status", "Completed"
+                )
+                frappe.db.commit()
+            except Exception:
+                frappe.db.rollback()
+                frappe.db.set_value(
+                    "Stock Repost Entry",
+                    name,
+                    {"status": "Failed", "error": frappe.get_traceback()},
+                )
+                frappe.db.commit()
+
+
+def repost_pair(item, warehouse, posting_date):
+    """Replay the ledger of one pair from `posting_date` with the item's valuation method.
+
+    Outgoing entries take the moving-average rate on hand when they post, or
+    for FIFO items the rate of the batches they consume from the queue stored
+    on the entry before `posting_date`, and every entry's running balance is
+    rewritten. Cancelled entries and their reversals are left out of the
+    replay, as if their voucher had never posted. Transfers whose outgoing
+    rate changes pass the new rate to their inbound entry and queue the
+    target pair in turn.
+    """
+    # hold the bin so no posting on this pair interleaves with the replay
+    get_bin_details_map([(item, warehouse)], for_update=True)
+
+    previous_sle = get_previous_sle(
+        item, warehouse, add_days(posting_date, -1), for_update=True
+    )
+    qty = flt(previous_sle.qty_after_transaction)
+    stock_value = flt(previous_sle.stock_value_after)
+    stock_queue = None
+    if get_valuation_methods([item])[item] == "FIFO":
+        stock_queue = FIFOQueue(previous_sle.stock_queue)
+
+    entries = frappe.db.sql(
+        """
+            SELECT name, actual_quantity, valuation_rate, voucher_no, voucher_detail_no,
+                   is_cancelled, qty_after_transaction, stock_value_after,
+                   valuation_rate_after, stock_queue
+            FROM `tabStock Ledger Entry`
+            WHERE item = %s AND warehouse = %s AND posting_date >= %s
+            ORDER BY posting_date, creation, name
+        """,
+        (item, warehouse, posting_date),
+        as_dict=True,
+    )
+
+    updates = {}
+    changed_outflows = []
+
+    for sle in entries:
+        valuation_rate = flt(sle.valuation_rate)
+        # a cancelled entry and its reversal keep their rate and only carry
+        # the balance, so together they still net to nothing
+        if not sle.is_cancelled:
+            if stock_queue and sle.actual_quantity > 0:
+                stock_queue.add(sle.actual_quantity, valuation_rate)
+            elif stock_queue:
+                fallback_rate = stock_value / qty if qty > 0 else valuation_rate
+                valuation_rate = (
+                    stock_queue.remove(-sle.actual_quantity, fallback_rate)
+                    / -sle.actual_quantity
+                )
+            elif sle.actual_quantity < 0:
+                valuation_rate = stock_value / qty if qty > 0 else valuation_rate
+
+            qty += sle.actual_quantity
+            stock_value += sle.actual_quantity * valuation_rate
+
+        balance = {
+            "valuation_rate": valuation_rate,
+            "qty_after_transaction": qty,
+            "stock_value_after": stock_value,
+            "valuation_rate_after": stock_value / qty if qty > 0 else 0,
+        }
+
+        changed = any(
+            flt(sle[field], 9) != flt(value, 9) for field, value in balance.items()
+        )
+        if stock_queue:
+            balance["stock_queue"] = stock_queue.as_json()
+            changed = changed or sle.stock_queue != balance["stock_queue"]
+
+        if changed:
+            updates[sle.name] = balance
+
+        rate_changed = flt(valuation_rate, 9) != flt(sle.valuation_rate, 9)
+        if sle.actual_quantity < 0 and rate_changed:
+            changed_outflows.append((sle, valuation_rate))
+
+    if updates:
+        frappe.db.bulk_update("Stock Ledger Entry", updates, update_modified=False)
+
+    frappe.db.set_value(
+        "Bin",
+        {"item": item, "warehouse": warehouse},
+        {
+            "stock_value": stock_value,
+            "valuation_rate": stock_value / qty if qty > 0 else 0,
+            "stock_queue": stock_queue.as_json() if stock_queue else None,
+        },
+        update_modified=False,
+    )
+    invalidate_pairs([(item, warehouse)])
+
+    if changed_outflows:
+        update_transfer_inflows(item, warehouse, changed_outflows)
+
+
+def update_transfer_inflows(item, warehouse, changed_outflows):
+    inflows = frappe.db.sql(
+        """
+            SELECT name, warehouse, posting_date, voucher_no, voucher_detail_no,
+                   actual_quantity
+            FROM `tabStock Ledger Entry`
+            WHERE voucher_no IN %(vouchers)s
+                AND item = %(item)s
+                AND warehouse != %(warehouse)s
+                AND actual_quantity > 0
+                AND is_cancelled = 0
+        """,
+        {
+            "vouchers": tuple({sle.voucher_no for sle, _ in changed_outflows}),
+            "item": item,
+            "warehouse": warehouse,
+        },
+        as_dict=True,
+    )
+
+    updates = {}
+    cascade = []
+    for outflow, valuation_rate in changed_outflows:
+        for inflow in inflows:
+            if inflow.voucher_no != outflow.voucher_no:
+                continue
+            if outflow.voucher_detail_no:
+                if inflow.voucher_detail_no != outflow.voucher_detail_no:
+                    continue
+            # entries posted before voucher_detail_no existed pair up by quantity
+            elif inflow.actual_quantity != -outflow.actual_quantity:
+                continue
+
+            updates[inflow.name] = {"valuation_rate": valuation_rate}
+            cascade.append((item, inflow.warehouse, inflow.posting_date))
+
+    if updates:
+        frappe.db.bulk_update("Stock Ledger Entry", updates, update_modified=False)
+        queue_repost(cascade)
+
+
+def queue_repost_for_later_entries(sl_entries):
+    """Queue a repost for every pair that already has entries after the new ones."""
+    earliest = {}
+    for sle in sl_entries:
+        key = (sle["item"], sle["warehouse"])
+        posting_date = getdate(sle["posting_date"])
+        if key not in earliest or posting_date < earliest[key]:
+            earliest[key] = posting_date
+
+    conditions = " OR ".join(["(item = %s AND warehouse = %s)"] * len(earliest))
+    latest = frappe.db.sql(
+        f"""
+            SELECT item, warehouse, MAX(posting_date)
+            FROM `tabStock Ledger Entry`
+            WHERE {conditions}
+            GROUP BY item, warehouse
+        """,
+        [value for pair in earliest for value in pair],
+    )
+
+    queue_repost(
+        (item, warehouse, earliest[(item, warehouse)])
+        for item, warehouse, latest_posting_date in latest
+        if getdate(latest_posting_date) > earliest[(item, warehouse)]
+    )
@@ -0,0 +1,116 @@
+# Copyright (c) 2025, SymonMuchemi and Contributors
+# See license.txt
+
+import frappe
+import uuid
+from frappe.tests.utils import FrappeTestCase
+from xwms.x_warehouse_management_system.doctype.stock_repost_entry.stock_repost_entry import (
+    process_repost_queue,
+)
+
+
+class TestStockRepostEntry(FrappeTestCase):
+    def setUp(self):
+        self.item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"REPOST-TV-{uuid.uuid4().hex[:6]}",
+            "item_name": "Repost TV",
+        }).insert()
+
+        self.warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Repost WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+        self.target_warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Repost Target WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+    def tearDown(self):
+        frappe.db.sql("DELETE FROM `tabStock Repost Entry`")
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
+        frappe.db.sql("DELETE FROM `tabStock Entry`")
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.sql("DELETE FROM `tabItem`")
+        frappe.db.commit()
+
+    def make_entry(self, entry_type, posting_date, quantity, valuation_rate=None):
+        row = {"item": self.item.name, "quantity": quantity}
+        if valuation_rate:
+            row["valuation_rate"] = valuation_rate
+
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": entry_type,
+            "posting_date": posting_date,
+            "from_warehouse": self.warehouse.name if entry_type != "Receipt" else None,
+            "to_warehouse": (
+                self.warehouse.name if entry_type == "Receipt"
+                else self.target_warehouse.name if entry_type == "Transfer"
+                else None
+            ),
+            "items": [row]
+        }).insert()
+        doc.submit()
+        return doc
+
+    def test_backdated_receipt_reposts_later_entries(self):
+        """ Test that a backdated receipt revalues later outflows and cascades transfers. """
+        self.make_entry("Receipt", "2025-05-10", 10, 100)
+        transfer = self.make_entry("Transfer", "2025-05-20", 5)
+
+        # backdated receipt changes the moving average on 2025-05-20 to 150
+        self.make_entry("Receipt", "2025-05-15", 10, 200)
+        self.assertTrue(frappe.db.exists("Stock Repost Entry", {"status": "Queued"}))
+
+        process_repost_queue()
+
+        sle = frappe.get_all("Stock Ledger Entry", filters={
+            "voucher_no": transfer.name
+        }, fields=["warehouse", "valuation_rate", "qty_after_transaction", "stock_value_after"])
+
+        outbound = next(s for s in sle if s.warehouse == self.warehouse.name)
+        inbound = next(s for s in sle if s.warehouse == self.target_warehouse.name)
+
+        self.assertEqual(outbound.valuation_rate, 150)
+        self.assertEqual(outbound.qty_after_transaction, 15)
+        self.assertEqual(outbound.stock_value_after, 2250)
+        self.assertEqual(inbound.valuation_rate, 150)
+        self.assertEqual(inbound.stock_value_after, 750)
+
+        self.assertEqual(
+            frappe.db.get_value(
+                "Bin", {"item": self.item.name, "warehouse": self.warehouse.name}, "stock_value"
+            ),
+            2250,
+        )
+        self.assertFalse(frappe.db.exists("Stock Repost Entry", {"status": "Queued"}))
+
+    def test_cancelled_backdated_receipt_reposts_later_entries(self):
+        """ Test that cancelling a backdated receipt revalues later outflows without it. """
+        self.make_entry("Receipt", "2025-05-10", 10, 100)
+        receipt = self.make_entry("Receipt", "2025-05-15", 10, 200)
+        consume = self.make_entry("Consume", "2025-05-20", 5)
+
+        # the consume went out at 150; with the receipt gone it takes 100
+        receipt.cancel()
+        process_repost_queue()
+
+        sle = frappe.get_all("Stock Ledger Entry", filters={
+            "voucher_no": consume.name
+        }, fields=["valuation_rate", "qty_after_transaction", "stock_value_after"])
+
+        self.assertEqual(sle[0].valuation_rate, 100)
+        self.assertEqual(sle[0].qty_after_transaction, 5)
+        self.assertEqual(sle[0].stock_value_after, 500)
+
+        self.assertEqual(
+            frappe.db.get_value(
+                "Bin", {"item": self.item.name, "warehouse": self.warehouse.name}, "stock_value"
+            ),
+            500,
+        )
@@ -1,9 +1,30 @@
 # Copyright (c) 2025, SymonMuchemi and Contributors
 # See license.txt
 
-# import frappe
+import frappe
+import uuid
 from frappe.tests.utils import FrappeTestCase
+from xwms.x_warehouse_management_system.doctype.warehouse.warehouse import (
+    get_warehouse_meta,
+)
 
 
 class TestWarehouse(FrappeTestCase):
-	pass
+    def tearDown(self):
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.commit()
+
+    def test_warehouse_meta_cache_refreshes_on_save(self):
+        """ Test that cached warehouse metadata is dropped when a warehouse is saved. """
+        warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Meta WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+        self.assertEqual(get_warehouse_meta(warehouse.name).is_group, 0)
+
+        warehouse.is_group = 1
+        warehouse.save()
+
+        self.assertEqual(get_warehouse_meta(warehouse.name).is_group, 1)
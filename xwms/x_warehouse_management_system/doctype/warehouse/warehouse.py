@@ -4,17 +4,75 @@
 import frappe
 from frappe.utils.nestedset import NestedSet
 
+from xwms.x_warehouse_management_system.stock_balance_cache import invalidate_masters
+
+WAREHOUSE_META_CACHE_KEY = "xwms_warehouse_meta"
+WAREHOUSE_META_FIELDS = ("is_group", "lft", "rgt", "parent_warehouse")
+
 
 class Warehouse(NestedSet):
     def before_save(self):
         self.validate_parent()
 
+    def on_update(self):
+        super().on_update()
+        clear_warehouse_meta_cache()
+
+    def after_rename(self, old, new, merge=False):
+        clear_warehouse_meta_cache()
+
+    def after_delete(self):
+        clear_warehouse_meta_cache()
+
     def validate_parent(self):
-        parent_is_group = frappe.db.get_value(
-            "warehouse", self.parent_warehouse, "is_group"
-        )
+        if not self.parent_warehouse:
+            return
+
+        parent_is_group = get_warehouse_meta(self.parent_warehouse).is_group
         if parent_is_group == 0:
-            print(f"is group value: {parent_is_group}")
             frappe.throw(
                 f"Invalid operation, {self.parent_warehouse} is not a valid parent!"
             )
+
+
+def get_warehouse_meta(warehouse):
+    return get_warehouses_meta([warehouse])[warehouse]
+
+
+def get_warehouses_meta(warehouses):
+    """Return is_group, lft, rgt and parent_warehouse for each warehouse.
+
+    Values are served from the request-local and site cache; warehouses
+    missing from both are fetched together in one query.
+    """
+    meta = {}
+    missing = []
+
+    for warehouse in set(filter(None, warehouses)):
+        cached = frappe.cache.hget(WAREHOUSE_META_CACHE_KEY, warehouse)
+        if cached is None:
+            missing.append(warehouse)
+        else:
+            meta[warehouse] = cached
+
+    if missing:
+        for row in frappe.get_all(
+            "Warehouse",
+            filters={"name": ["in", missing]},
+            fields=["name", *WAREHOUSE_META_FIELDS],
+        ):
+            warehouse = row.pop("name")
+            frappe.cache.hset(WAREHOUSE_META_CACHE_KEY, warehouse, row)
+            meta[warehouse] = row
+
+    # unknown warehouses resolve to empty metadata and are not cached
+    return {warehouse: meta.get(warehouse, frappe._dict()) for warehouse in warehouses}
+
+
+def clear_warehouse_meta_cache():
+    # saving one node of the nested set can shift lft/rgt across the
+    # whole tree, so drop every cached warehouse rather than just this one
+    frappe.cache.delete_value(WAREHOUSE_META_CACHE_KEY)
+
+    # cached report results show warehouse names and group subtotals
+    invalidate_masters()
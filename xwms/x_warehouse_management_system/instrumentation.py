@@ -0,0 +1,188 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+"""Optional query and latency instrumentation for stock postings and reports.
+
+Enable it per site with `bench --site <site> set-config xwms_instrumentation 1`.
+While enabled, every call wrapped with `instrumented` records its wall time,
+number of SQL statements, total DB time and slowest statements. Each call is
+logged to the `xwms.instrumentation` logger and its summary is returned in an
+`X-XWMS-Instrumentation` response header, and totals per call accumulate in
+redis for `get_instrumentation_stats`. While disabled, a wrapped call costs
+one config lookup.
+"""
+
+import functools
+import heapq
+import json
+import time
+
+import frappe
+
+STATS_CACHE_KEY = "xwms_instrumentation_stats"
+RESPONSE_HEADER = "X-XWMS-Instrumentation"
+SLOWEST_QUERIES = 5
+QUERY_TEXT_LENGTH = 500
+
+
+def instrumented(name):
+    """Record query count, DB time and slowest statements of each call when enabled."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not frappe.conf.get("xwms_instrumentation"):
+                return fn(*args, **kwargs)
+
+            with CallStats(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class CallStats:
+    """Statistics of one instrumented call, collected while it is on the stack.
+
+    The first call on the stack routes `frappe.db.sql`, which every query
+    helper goes through, via `add_query`; nested calls are counted in their
+    own stats as well as in their callers'.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = []
+
+    def __enter__(self):
+        stack = frappe.local.xwms_instrumentation_stack = getattr(
+            frappe.local, "xwms_instrumentation_stack", []
+        )
+        if not stack:
+            patch_db_sql()
+
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall_time = time.perf_counter() - self.start
+
+        stack = frappe.local.xwms_instrumentation_stack
+        stack.pop()
+        if not stack:
+            unpatch_db_sql()
+
+        self.publish()
+
+    def add_query(self, query, duration):
+        self.queries += 1
+        self.db_time += duration
+
+        entry = (duration, str(query)[:QUERY_TEXT_LENGTH])
+        if len(self.slowest) < SLOWEST_QUERIES:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def as_dict(self):
+        return {
+            "call": self.name,
+            "wall_ms": round(self.wall_time * 1000, 3),
+            "queries": self.queries,
+            "db_ms": round(self.db_time * 1000, 3),
+            "slowest": [
+                {"ms": round(duration * 1000, 3), "query": " ".join(query.split())}
+                for duration, query in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+    def publish(self):
+        summary = self.as_dict()
+        frappe.logger("xwms.instrumentation").info(summary)
+
+        if not hasattr(frappe.local, "xwms_instrumentation"):
+            frappe.local.xwms_instrumentation = []
+        frappe.local.xwms_instrumentation.append(summary)
+
+        key = frappe.cache.make_key(STATS_CACHE_KEY)
+        pipeline = frappe.cache.pipeline()
+        pipeline.hincrby(key, f"{self.name}|calls", 1)
+        pipeline.hincrby(key, f"{self.name}|queries", self.queries)
+        pipeline.hincrbyfloat(key, f"{self.name}|wall_time", self.wall_time)
+        pipeline.hincrbyfloat(key, f"{self.name}|db_time", self.db_time)
+        pipeline.execute()
+
+
+def patch_db_sql():
+    original = frappe.db.sql
+
+    @functools.wraps(original)
+    def sql(query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(query, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            for stats in frappe.local.xwms_instrumentation_stack:
+                stats.add_query(query, duration)
+
+    # an instance attribute shadows Database.sql for this connection only,
+    # including the calls the other frappe.db helpers make through self.sql
+    frappe.db.sql = sql
+
+
+def unpatch_db_sql():
+    del frappe.db.sql
+
+
+def add_instrumentation_header(response=None, request=None):
+    """after_request hook: summarize this request's instrumented calls in a header."""
+    calls = getattr(frappe.local, "xwms_instrumentation", None)
+    if not calls or response is None:
+        return
+
+    response.headers[RESPONSE_HEADER] = json.dumps(
+        [{key: call[key] for key in ("call", "wall_ms", "queries", "db_ms")} for call in calls],
+        separators=(",", ":"),
+    )
+
+
+@frappe.whitelist()
+def get_instrumentation_stats():
+    """Return call count and average wall time, DB time and queries per instrumented call."""
+    frappe.only_for("System Manager")
+
+    # counters are raw redis integers/floats, not the pickled values the
+    # frappe.cache helpers expect, so read them through a plain pipeline
+    pipeline = frappe.cache.pipeline()
+    pipeline.hgetall(frappe.cache.make_key(STATS_CACHE_KEY))
+    (counters,) = pipeline.execute()
+
+    totals = {}
+    for field, value in counters.items():
+        name, metric = frappe.safe_decode(field).rsplit("|", 1)
+        totals.setdefault(name, {})[metric] = float(value)
+
+    stats = []
+    for name, total in sorted(totals.items()):
+        calls = total.get("calls") or 1
+        stats.append(
+            {
+                "call": name,
+                "calls": int(total.get("calls", 0)),
+                "avg_wall_ms": round(total.get("wall_time", 0) / calls * 1000, 3),
+                "avg_db_ms": round(total.get("db_time", 0) / calls * 1000, 3),
+                "avg_queries": round(total.get("queries", 0) / calls, 2),
+            }
+        )
+
+    return stats
+
+
+@frappe.whitelist(methods=["POST"])
+def reset_instrumentation_stats():
+    frappe.only_for("System Manager")
+    frappe.cache.delete(frappe.cache.make_key(STATS_CACHE_KEY))
@@ -0,0 +1,65 @@
+# Copyright (c) 2025, SymonMuchemi and Contributors
+# See license.txt
+
+import frappe
+import uuid
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, today
+from .stock_aging_report import execute
+
+
+class TestStockAgingReport(FrappeTestCase):
+    def setUp(self):
+        self.item = frappe.get_doc(
+            {
+                "doctype": "Item",
+                "code": f"AGING-TV{uuid.uuid4()}",
+                "item_name": "Aging TV",
+                "unit": "Nos",
+            }
+        ).insert()
+
+        self.warehouse = frappe.get_doc(
+            {"doctype": "Warehouse", "warehouse_name": "Aging Bin A", "is_group": 0}
+        ).insert()
+
+    def tearDown(self):
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
+        frappe.db.sql("DELETE FROM `tabStock Entry`")
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.sql("DELETE FROM `tabItem`")
+        frappe.db.commit()
+
+    def make_entry(self, entry_type, days_ago, quantity):
+        row = {"item": self.item.name, "quantity": quantity}
+        if entry_type == "Receipt":
+            row["valuation_rate"] = 1000
+
+        frappe.get_doc(
+            {
+                "doctype": "Stock Entry",
+                "type": entry_type,
+                "posting_date": add_days(today(), -days_ago),
+                "to_warehouse": self.warehouse.name if entry_type == "Receipt" else None,
+                "from_warehouse": self.warehouse.name if entry_type == "Consume" else None,
+                "items": [row],
+            }
+        ).insert().submit()
+
+    def test_outflows_consume_oldest_stock_first(self):
+        """ Test that outflows draw down the oldest receipts and the rest are bucketed by age. """
+        self.make_entry("Receipt", 200, 10)
+        self.make_entry("Receipt", 60, 5)
+        self.make_entry("Receipt", 10, 3)
+        self.make_entry("Consume", 5, 12)
+
+        columns, data = execute({"item": self.item.name, "posting_date": today()})
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0].qty, 6)
+        self.assertEqual(data[0].age_0_30, 3)
+        self.assertEqual(data[0].age_31_90, 3)
+        self.assertEqual(data[0].age_91_180, 0)
+        self.assertEqual(data[0].age_above_180, 0)
+        self.assertEqual(data[0].average_age, 35)
@@ -1,13 +1,32 @@
 # Copyright (c) 2025, SymonMuchemi and contributors
 # For license information, please see license.txt
 
+from itertools import groupby
+
 import frappe
+from frappe.utils import add_days
+
+from xwms.x_warehouse_management_system.doctype.stock_closing_entry.stock_closing_entry import (
+    get_last_closing_date,
+)
+from xwms.x_warehouse_management_system.doctype.warehouse.warehouse import (
+    get_warehouse_meta,
+    get_warehouses_meta,
+)
+from xwms.x_warehouse_management_system.instrumentation import instrumented
+from xwms.x_warehouse_management_system.stock_balance_cache import get_cached_result
+from xwms.x_warehouse_management_system.stock_ledger_archive import (
+    SLE_VALUE,
+    get_ledger_table,
+    is_archived,
+)
 
 
+@instrumented("Stock Balance Report.execute")
 def execute(filters=None):
     filters = filters or {}
     columns = get_columns()
-    data = get_data(filters)
+    data = get_cached_result(filters, get_data)
     return columns, data
 
 
@@ -44,34 +63,207 @@ def get_columns():
 
 
 def get_data(filters):
-    conditions = []
+    closing_date = None
+    if filters.get("posting_date"):
+        closing_date = get_last_closing_date(filters.get("posting_date"))
 
-    if filters.get("item"):
-        conditions.append("item = %(item)s")
+    data = get_balances(filters, closing_date=closing_date)
+
+    warehouse = filters.get("warehouse")
+    if warehouse and get_warehouse_meta(warehouse).is_group:
+        data = add_group_subtotals(data, warehouse)
+
+    return data
+
+
+def get_balances(filters, closing_date=None):
+    """Return the balance of every bin matching `filters` as of `posting_date`.
+
+    With a `closing_date`, balances start from that period closing's
+    snapshot and add only the ledger movements posted after it.
+    """
+    # balances as of an archived date are summed from the archived entries;
+    # the live ledger's latest entry on or before it is the archival's opening
+    if closing_date or is_archived(filters.get("posting_date")):
+        return get_balances_from_closing(filters, closing_date)
+
+    return get_balances_from_ledger(filters)
 
-    if filters.get("warehouse"):
-        conditions.append("warehouse = %(warehouse)s")
 
+def get_balances_from_ledger(filters):
+    joins, where_clause = get_conditions(filters, "bin")
+
+    posting_date_condition = ""
     if filters.get("posting_date"):
-        conditions.append("posting_date <= %(posting_date)s")
+        posting_date_condition = "AND latest.posting_date <= %(posting_date)s"
 
-    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+    # every ledger entry carries the balance after it posts, so the balance
+    # as of a date is the latest entry on or before it for each bin
+    query = f"""
+        SELECT
+            sle.item,
+            sle.warehouse,
+            sle.qty_after_transaction AS qty,
+            sle.valuation_rate_after AS valuation_rate,
+            sle.stock_value_after AS stock_value
+        FROM (
+            SELECT (
+                SELECT latest.name
+                FROM `tabStock Ledger Entry` latest
+                WHERE latest.item = bin.item
+                    AND latest.warehouse = bin.warehouse
+                    {posting_date_condition}
+                ORDER BY latest.posting_date DESC, latest.creation DESC, latest.name DESC
+                LIMIT 1
+            ) AS sle_name
+            FROM `tabBin` bin
+            {joins}
+            {where_clause}
+        ) balance
+        INNER JOIN `tabStock Ledger Entry` sle ON sle.name = balance.sle_name
+        WHERE sle.qty_after_transaction >= 0
+        ORDER BY sle.item, sle.warehouse
+    """
+
+    return frappe.db.sql(query, filters, as_dict=True)
+
+
+def get_balances_from_closing(filters, closing_date=None):
+    """Sum the ledger movements after `closing_date` onto its snapshot, or all of them.
+
+    The item and warehouse filters apply inside both branches of the union,
+    so each reads only the matching rows before anything is summed.
+    """
+    ledger = get_ledger_table(add_days(closing_date, 1) if closing_date else None)
+
+    snapshot = ""
+    ledger_conditions = []
+    if closing_date:
+        snapshot_joins, snapshot_where_clause = get_conditions(
+            filters, "snapshot", ["snapshot.closing_date = %(closing_date)s"]
+        )
+        snapshot = f"""
+            SELECT snapshot.item, snapshot.warehouse, snapshot.qty, snapshot.stock_value
+            FROM `tabStock Closing Balance` snapshot
+            {snapshot_joins}
+            {snapshot_where_clause}
+            UNION ALL
+        """
+        ledger_conditions.append("sle.posting_date > %(closing_date)s")
+
+    if filters.get("posting_date"):
+        ledger_conditions.append("sle.posting_date <= %(posting_date)s")
+
+    ledger_joins, ledger_where_clause = get_conditions(filters, "sle", ledger_conditions)
 
     query = f"""
-        SELECT 
-            item,
-            warehouse,
-            SUM(actual_quantity) AS qty,
-            CASE 
-                WHEN SUM(actual_quantity) <= 0 THEN 0
-                ELSE SUM(actual_quantity * valuation_rate) / SUM(actual_quantity)
+        SELECT
+            balance.item,
+            balance.warehouse,
+            SUM(balance.qty) AS qty,
+            CASE
+                WHEN SUM(balance.qty) <= 0 THEN 0
+                ELSE SUM(balance.stock_value) / SUM(balance.qty)
             END AS valuation_rate,
-            SUM(actual_quantity * valuation_rate) AS stock_value
-        FROM `tabStock Ledger Entry`
-        {where_clause}
-        GROUP BY item, warehouse
+            SUM(balance.stock_value) AS stock_value
+        FROM (
+            {snapshot}
+            SELECT sle.item, sle.warehouse, sle.actual_quantity AS qty,
+                   {SLE_VALUE} AS stock_value
+            FROM {ledger} sle
+            {ledger_joins}
+            {ledger_where_clause}
+        ) balance
+        GROUP BY balance.item, balance.warehouse
         HAVING qty >= 0
-        ORDER BY item, warehouse
+        ORDER BY balance.item, balance.warehouse
     """
 
-    return frappe.db.sql(query, filters, as_dict=True)
+    return frappe.db.sql(query, {**filters, "closing_date": closing_date}, as_dict=True)
+
+
+def get_conditions(filters, table, conditions=None):
+    conditions = list(conditions or [])
+    joins = ""
+
+    if filters.get("item"):
+        conditions.append(f"{table}.item = %(item)s")
+
+    if filters.get("warehouse"):
+        # a warehouse filter covers its whole subtree, resolved by the
+        # nested-set bounds of the selected warehouse in the same query
+        joins = f"""
+            INNER JOIN `tabWarehouse` wh ON wh.name = {table}.warehouse
+            INNER JOIN `tabWarehouse` parent_wh
+                ON parent_wh.name = %(warehouse)s
+                AND wh.lft >= parent_wh.lft
+                AND wh.rgt <= parent_wh.rgt
+        """
+
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    return joins, where_clause
+
+
+def add_group_subtotals(data, warehouse):
+    """Add a bold subtotal row per item for every group within `warehouse`."""
+    parent = get_warehouse_meta(warehouse)
+    groups = frappe.get_all(
+        "Warehouse",
+        filters={"is_group": 1, "lft": [">=", parent.lft], "rgt": ["<=", parent.rgt]},
+        fields=["name", "lft", "rgt"],
+        order_by="lft",
+    )
+    group_lft = {group.name: group.lft for group in groups}
+    ancestors = get_group_ancestors(
+        groups, get_warehouses_meta({row.warehouse for row in data})
+    )
+
+    result = []
+    for item, rows in groupby(data, key=lambda row: row.item):
+        subtotals = {}
+        for row in rows:
+            result.append(row)
+            for group in ancestors[row.warehouse]:
+                subtotal = subtotals.get(group.name)
+                if not subtotal:
+                    subtotal = subtotals[group.name] = frappe._dict(
+                        item=item, warehouse=group.name, qty=0, stock_value=0
+                    )
+                subtotal.qty += row.qty
+                subtotal.stock_value += row.stock_value
+
+        # subtotals follow the rows of their item, in tree order
+        for subtotal in sorted(subtotals.values(), key=lambda row: group_lft[row.warehouse]):
+            subtotal.valuation_rate = (
+                subtotal.stock_value / subtotal.qty if subtotal.qty > 0 else 0
+            )
+            subtotal.bold = 1
+            result.append(subtotal)
+
+    return result
+
+
+def get_group_ancestors(groups, warehouses_meta):
+    """Map each warehouse to the groups that contain it, in one pass in lft order.
+
+    `groups` must be ordered by lft. Nested-set ranges nest, so the groups
+    open at any point form a stack whose top closes first.
+    """
+    ancestors = {}
+    open_groups = []
+    pending = iter(groups)
+    group = next(pending, None)
+
+    for name, meta in sorted(warehouses_meta.items(), key=lambda entry: entry[1].lft):
+        while group and group.lft < meta.lft:
+            while open_groups and open_groups[-1].rgt < group.lft:
+                open_groups.pop()
+            open_groups.append(group)
+            group = next(pending, None)
+
+        while open_groups and open_groups[-1].rgt < meta.lft:
+            open_groups.pop()
+        ancestors[name] = list(open_groups)
+
+    return ancestors
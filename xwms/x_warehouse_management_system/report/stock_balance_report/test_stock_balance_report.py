@@ -41,6 +41,7 @@ class TestStockBalanceReport(FrappeTestCase):
 
     def tearDown(self):
         frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
         frappe.db.sql("DELETE FROM `tabStock Entry`")
         frappe.db.sql("DELETE FROM `tabWarehouse`")
         frappe.db.sql("DELETE FROM `tabItem`")
@@ -98,3 +99,71 @@ class TestStockBalanceReport(FrappeTestCase):
             "Stock Balance Report should not return any data for nonexistent item and warehouse.",
         )
     
+    def test_group_warehouse_rolls_up_subtree(self):
+        """ Test that a group warehouse filter lists its subtree's bins with a subtotal per group. """
+        zone = frappe.get_doc(
+            {"doctype": "Warehouse", "warehouse_name": "Report Zone", "is_group": 1}
+        ).insert()
+        shelf = frappe.get_doc(
+            {
+                "doctype": "Warehouse",
+                "warehouse_name": "Report Shelf",
+                "parent_warehouse": zone.name,
+                "is_group": 0,
+            }
+        ).insert()
+
+        doc = frappe.get_doc(
+            {
+                "doctype": "Stock Entry",
+                "type": "Receipt",
+                "posting_date": "2025-05-16",
+                "to_warehouse": shelf.name,
+                "items": [
+                    {"item": self.item.name, "quantity": 3, "valuation_rate": 10000}
+                ],
+            }
+        ).insert()
+        doc.submit()
+
+        filters = {
+            "item": self.item.name,
+            "warehouse": zone.name,
+            "posting_date": "2025-05-16",
+        }
+
+        columns, data = execute(filters)
+
+        detail = [row for row in data if row["warehouse"] == shelf.name]
+        subtotal = [row for row in data if row["warehouse"] == zone.name]
+
+        self.assertEqual(len(detail), 1)
+        self.assertEqual(len(subtotal), 1)
+        self.assertEqual(subtotal[0]["qty"], 3)
+        self.assertEqual(subtotal[0]["stock_value"], 30000)
+
+    def test_cached_result_refreshes_after_posting(self):
+        """ Test that a posting invalidates the cached result of the pairs it touches. """
+        filters = {
+            "item": self.item.name,
+            "warehouse": self.warehouse.name,
+            "posting_date": "2025-05-20",
+        }
+
+        columns, data = execute(filters)
+        self.assertEqual(data[0]["qty"], 5)
+
+        # the posting bumps the pair's version, so the cached run is not served
+        doc = frappe.get_doc(
+            {
+                "doctype": "Stock Entry",
+                "type": "Consume",
+                "posting_date": "2025-05-18",
+                "from_warehouse": self.warehouse.name,
+                "items": [{"item": self.item.name, "quantity": 2}],
+            }
+        ).insert()
+        doc.submit()
+
+        columns, data = execute(filters)
+        self.assertEqual(data[0]["qty"], 3)
@@ -30,4 +30,57 @@ frappe.query_reports["Stock Ledger Report"] = {
 			default: frappe.datetime.nowdate(),
 		},
 	],
+
+	onload(report) {
+		report.page.add_inner_button(__("Export Full Ledger (CSV)"), () => {
+			const args = new URLSearchParams({
+				filters: JSON.stringify(report.get_filter_values()),
+				compress: 1,
+			});
+			window.open(
+				"/api/method/xwms.x_warehouse_management_system.report.stock_ledger_report.stock_ledger_report.export_stock_ledger?" +
+					args.toString()
+			);
+		});
+
+		report.load_more_button = report.page.add_inner_button(__("Load More"), () => {
+			const data = report.data || [];
+			const last = get_last_ledger_row(data);
+			if (!last) return;
+
+			frappe.call({
+				method: "xwms.x_warehouse_management_system.report.stock_ledger_report.stock_ledger_report.get_next_page",
+				args: {
+					filters: report.get_filter_values(),
+					cursor: {
+						posting_date: last.posting_date,
+						creation: last.creation,
+						name: last.name,
+					},
+				},
+				callback(r) {
+					const rows = r.message || [];
+					if (!rows.length) {
+						frappe.show_alert(__("No more entries"));
+						return;
+					}
+
+					report.data = data.concat(rows);
+					report.render_datatable();
+				},
+			});
+		});
+	},
+
+	after_datatable_render() {
+		// opening rows carry no cursor, so a page of only openings has nothing to load after
+		const report = frappe.query_report;
+		report.load_more_button?.toggle(!!get_last_ledger_row(report.data || []));
+	},
 };
+
+function get_last_ledger_row(data) {
+	for (let i = data.length - 1; i >= 0; i--) {
+		if (data[i].name) return data[i];
+	}
+}
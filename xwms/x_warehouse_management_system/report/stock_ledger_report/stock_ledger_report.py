@@ -1,13 +1,35 @@
 # Copyright (c) 2025, SymonMuchemi and contributors
 # For license information, please see license.txt
 
+import csv
+import io
+import zlib
+
 import frappe
+from frappe.utils import add_days, cint, getdate
+from werkzeug.wrappers import Response
+
+from xwms.x_warehouse_management_system.doctype.stock_closing_entry.stock_closing_entry import (
+    get_last_closing_date,
+)
+from xwms.x_warehouse_management_system.instrumentation import instrumented
+from xwms.x_warehouse_management_system.report.stock_balance_report.stock_balance_report import (
+    get_balances,
+)
+from xwms.x_warehouse_management_system.stock_ledger_archive import (
+    SLE_VALUE,
+    get_ledger_table,
+)
+
+PAGE_LENGTH = 500
+EXPORT_CHUNK_SIZE = 5000
 
 
+@instrumented("Stock Ledger Report.execute")
 def execute(filters=None):
     filters = filters or {}
     columns = get_columns()
-    data = get_data(filters)
+    data = get_opening_rows(filters) + get_data(filters)
     return columns, data
 
 
@@ -46,6 +68,18 @@ def get_columns():
             "width": 120,
         },
         {"label": "Value", "fieldname": "value", "fieldtype": "Currency", "width": 120},
+        {
+            "label": "Balance Quantity",
+            "fieldname": "qty_after_transaction",
+            "fieldtype": "Float",
+            "width": 120,
+        },
+        {
+            "label": "Balance Value",
+            "fieldname": "stock_value_after",
+            "fieldtype": "Currency",
+            "width": 120,
+        },
         {
             "label": "Voucher Type",
             "fieldname": "voucher_type",
@@ -62,20 +96,32 @@ def get_columns():
     ]
 
 
-def get_data(filters):
-    conditions = []
-
-    if filters.get("item"):
-        conditions.append("item = %(item)s")
-
-    if filters.get("warehouse"):
-        conditions.append("warehouse = %(warehouse)s")
+def get_data(filters, cursor=None, page_length=PAGE_LENGTH):
+    """Return one page of ledger entries after `cursor`.
 
-    if filters.get("from_date"):
-        conditions.append("posting_date >= %(from_date)s")
+    Entries are ordered by (posting_date, creation, name) and a page starts
+    right after the cursor entry, so every page costs the same index seek
+    however deep into the ledger it is. Archived entries are only read when
+    `from_date` reaches back to the archive.
+    """
+    conditions = get_conditions(filters)
+    values = dict(filters)
 
-    if filters.get("to_date"):
-        conditions.append("posting_date <= %(to_date)s")
+    if cursor:
+        conditions.append(
+            """(
+                posting_date > %(cursor_posting_date)s
+                OR (posting_date = %(cursor_posting_date)s AND (
+                    creation > %(cursor_creation)s
+                    OR (creation = %(cursor_creation)s AND name > %(cursor_name)s)
+                ))
+            )"""
+        )
+        values.update(
+            cursor_posting_date=cursor["posting_date"],
+            cursor_creation=cursor["creation"],
+            cursor_name=cursor["name"],
+        )
 
     where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
 
@@ -86,12 +132,181 @@ def get_data(filters):
             warehouse,
             actual_quantity,
             valuation_rate,
-            (actual_quantity * valuation_rate) AS value,
+            {SLE_VALUE} AS value,
             voucher_type,
-            voucher_no
-        FROM `tabStock Ledger Entry`
+            voucher_no,
+            qty_after_transaction,
+            stock_value_after,
+            creation,
+            name
+        FROM {get_ledger_table(filters.get("from_date"))} sle
         {where_clause}
-        ORDER BY posting_date ASC
+        ORDER BY posting_date ASC, creation ASC, name ASC
+        LIMIT {cint(page_length)}
+    """
+
+    return frappe.db.sql(query, values, as_dict=True)
+
+
+def get_opening_rows(filters):
+    """Return one opening balance row per item and warehouse as of `from_date`.
+
+    Running balances need no work here: every ledger entry already stores
+    the balance after it posts (qty_after_transaction, stock_value_after).
+    """
+    if not filters.get("from_date"):
+        return []
+
+    opening_date = add_days(filters.get("from_date"), -1)
+    balances = get_balances(
+        {
+            "item": filters.get("item"),
+            "warehouse": filters.get("warehouse"),
+            "posting_date": opening_date,
+        },
+        closing_date=get_last_closing_date(opening_date),
+    )
+
+    return [
+        frappe._dict(
+            posting_date=getdate(filters.get("from_date")),
+            item=balance.item,
+            warehouse=balance.warehouse,
+            voucher_type="Opening",
+            qty_after_transaction=balance.qty,
+            stock_value_after=balance.stock_value,
+            bold=1,
+        )
+        for balance in balances
+        if balance.qty or balance.stock_value
+    ]
+
+
+def get_conditions(filters):
+    conditions = []
+
+    if filters.get("item"):
+        conditions.append("item = %(item)s")
+
+    if filters.get("warehouse"):
+        # a warehouse filter covers its whole subtree, as it does for the
+        # opening balances read through the Stock Balance Report
+        conditions.append(
+            """warehouse IN (
+                SELECT wh.name
+                FROM `tabWarehouse` wh
+                INNER JOIN `tabWarehouse` parent_wh
+                    ON parent_wh.name = %(warehouse)s
+                    AND wh.lft >= parent_wh.lft
+                    AND wh.rgt <= parent_wh.rgt
+            )"""
+        )
+
+    if filters.get("from_date"):
+        conditions.append("posting_date >= %(from_date)s")
+
+    if filters.get("to_date"):
+        conditions.append("posting_date <= %(to_date)s")
+
+    return conditions
+
+
+@frappe.whitelist()
+def get_next_page(filters, cursor):
+    """Return the page of ledger entries after `cursor` for the report's "Load More"."""
+    frappe.has_permission("Stock Ledger Entry", "report", throw=True)
+
+    filters = frappe._dict(frappe.parse_json(filters))
+    cursor = frappe.parse_json(cursor)
+
+    return get_data(filters, cursor=cursor)
+
+
+@frappe.whitelist()
+def export_stock_ledger(filters=None, compress=0):
+    """Stream every ledger entry matching the report filters as CSV.
+
+    Rows are read from an unbuffered cursor and written out in chunks, so
+    memory stays flat however large the ledger is. Pass `compress` to get
+    a gzip-compressed file.
     """
+    frappe.has_permission("Stock Ledger Entry", "export", throw=True)
+
+    filters = frappe._dict(frappe.parse_json(filters) or {})
+    compress = cint(compress)
+    filename = "stock_ledger.csv.gz" if compress else "stock_ledger.csv"
+
+    return Response(
+        stream_stock_ledger(
+            frappe.local.site,
+            frappe.local.sites_path,
+            frappe.session.user,
+            filters,
+            compress,
+        ),
+        mimetype="application/gzip" if compress else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        direct_passthrough=True,
+    )
+
+
+def stream_stock_ledger(site, sites_path, user, filters, compress):
+    # the response body is iterated after the request has been torn down,
+    # so the generator opens (and closes) its own site connection
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    frappe.set_user(user)
+
+    try:
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+        def encode(chunk):
+            data = chunk.encode("utf-8")
+            return compressor.compress(data) if compressor else data
+
+        conditions = get_conditions(filters)
+        where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+        fieldnames = [column["fieldname"] for column in get_columns()]
+        labels = [column["label"] for column in get_columns()]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(labels)
+
+        with frappe.db.unbuffered_cursor():
+            rows = frappe.db.sql(
+                f"""
+                    SELECT
+                        posting_date,
+                        item,
+                        warehouse,
+                        actual_quantity,
+                        valuation_rate,
+                        {SLE_VALUE} AS value,
+                        qty_after_transaction,
+                        stock_value_after,
+                        voucher_type,
+                        voucher_no
+                    FROM {get_ledger_table(filters.get("from_date"))} sle
+                    {where_clause}
+                    ORDER BY posting_date ASC, creation ASC, name ASC
+                """,
+                filters,
+                as_dict=True,
+                as_iterator=True,
+            )
+
+            for count, row in enumerate(rows, 1):
+                writer.writerow([row[fieldname] for fieldname in fieldnames])
+
+                if count % EXPORT_CHUNK_SIZE == 0:
+                    yield encode(buffer.getvalue())
+                    buffer.seek(0)
+                    buffer.truncate()
+
+        yield encode(buffer.getvalue())
 
-    return frappe.db.sql(query, filters, as_dict=True)
+        if compressor:
+            yield compressor.flush()
+    finally:
+        frappe.destroy()
@@ -1,9 +1,14 @@
 # Copyright (c) 2025, SymonMuchemi and Contributors
 # See license.txt
 
+import csv
+import gzip
+import io
 import frappe
+from unittest.mock import patch
 from frappe.tests.utils import FrappeTestCase
-from .stock_ledger_report import execute
+from . import stock_ledger_report
+from .stock_ledger_report import execute, get_columns, get_data, stream_stock_ledger
 
 
 class TestStockLedgerReport(FrappeTestCase):
@@ -40,6 +45,7 @@ class TestStockLedgerReport(FrappeTestCase):
 
     def tearDown(self):
         frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
         frappe.db.sql("DELETE FROM `tabStock Entry`")
         frappe.db.sql("DELETE FROM `tabWarehouse`")
         frappe.db.sql("DELETE FROM `tabItem`")
@@ -95,3 +101,146 @@ class TestStockLedgerReport(FrappeTestCase):
             ),
             "Stock Ledger Report should include the issue entry.",
         )
+
+    def test_stock_ledger_pages_after_cursor(self):
+        """ Test that a page read after a cursor starts right after the cursor entry. """
+        for posting_date in ("2025-05-17", "2025-05-18"):
+            frappe.get_doc(
+                {
+                    "doctype": "Stock Entry",
+                    "type": "Receipt",
+                    "posting_date": posting_date,
+                    "to_warehouse": self.warehouse.name,
+                    "items": [
+                        {"item": self.item.name, "quantity": 1, "valuation_rate": 15000}
+                    ],
+                }
+            ).insert().submit()
+
+        filters = {"item": self.item.name, "warehouse": self.warehouse.name}
+
+        first_page = get_data(filters, page_length=2)
+        second_page = get_data(filters, cursor=first_page[-1], page_length=2)
+
+        self.assertEqual(len(first_page), 2)
+        self.assertEqual(len(second_page), 1)
+        self.assertEqual(str(second_page[0]["posting_date"]), "2025-05-18")
+
+    def test_stock_ledger_opening_and_running_balance(self):
+        """ Test that the report opens with the balance before from_date and runs it forward. """
+        doc = frappe.get_doc(
+            {
+                "doctype": "Stock Entry",
+                "type": "Consume",
+                "posting_date": "2025-05-20",
+                "from_warehouse": self.warehouse.name,
+                "items": [{"item": self.item.name, "quantity": 2}],
+            }
+        ).insert()
+        doc.submit()
+
+        filters = {
+            "item": self.item.name,
+            "warehouse": self.warehouse.name,
+            "from_date": "2025-05-18",
+            "to_date": "2025-05-31",
+        }
+
+        columns, data = execute(filters)
+
+        opening, movement = data
+        self.assertEqual(opening["voucher_type"], "Opening")
+        self.assertEqual(opening["qty_after_transaction"], 5)
+        self.assertEqual(opening["stock_value_after"], 75000)
+        self.assertEqual(movement["voucher_no"], doc.name)
+        self.assertEqual(movement["qty_after_transaction"], 3)
+        self.assertEqual(movement["stock_value_after"], 45000)
+
+    def test_group_warehouse_covers_subtree(self):
+        """ Test that a group warehouse filter returns the ledger and openings of its subtree. """
+        zone = frappe.get_doc(
+            {"doctype": "Warehouse", "warehouse_name": "Ledger Zone", "is_group": 1}
+        ).insert()
+        shelf = frappe.get_doc(
+            {
+                "doctype": "Warehouse",
+                "warehouse_name": "Ledger Shelf",
+                "parent_warehouse": zone.name,
+                "is_group": 0,
+            }
+        ).insert()
+
+        for posting_date in ("2025-05-16", "2025-05-20"):
+            frappe.get_doc(
+                {
+                    "doctype": "Stock Entry",
+                    "type": "Receipt",
+                    "posting_date": posting_date,
+                    "to_warehouse": shelf.name,
+                    "items": [
+                        {"item": self.item.name, "quantity": 3, "valuation_rate": 10000}
+                    ],
+                }
+            ).insert().submit()
+
+        filters = {
+            "item": self.item.name,
+            "warehouse": zone.name,
+            "from_date": "2025-05-18",
+            "to_date": "2025-05-31",
+        }
+
+        columns, data = execute(filters)
+
+        opening, movement = data
+        self.assertEqual(opening["warehouse"], shelf.name)
+        self.assertEqual(opening["qty_after_transaction"], 3)
+        self.assertEqual(movement["warehouse"], shelf.name)
+        self.assertEqual(movement["qty_after_transaction"], 6)
+
+    def stream(self, filters, compress=0):
+        # the stream opens its own site connection; keep it on the test's
+        with patch("frappe.init"), patch("frappe.connect"), patch("frappe.destroy"):
+            return list(
+                stream_stock_ledger(
+                    frappe.local.site,
+                    frappe.local.sites_path,
+                    frappe.session.user,
+                    frappe._dict(filters),
+                    compress,
+                )
+            )
+
+    def test_export_streams_csv_in_chunks(self):
+        """ Test that the export streams a header and every entry, chunk by chunk, plain or gzipped. """
+        for posting_date in ("2025-05-17", "2025-05-18"):
+            frappe.get_doc(
+                {
+                    "doctype": "Stock Entry",
+                    "type": "Receipt",
+                    "posting_date": posting_date,
+                    "to_warehouse": self.warehouse.name,
+                    "items": [
+                        {"item": self.item.name, "quantity": 1, "valuation_rate": 15000}
+                    ],
+                }
+            ).insert().submit()
+
+        filters = {"item": self.item.name, "warehouse": self.warehouse.name}
+
+        with patch.object(stock_ledger_report, "EXPORT_CHUNK_SIZE", 2):
+            chunks = self.stream(filters)
+            compressed = self.stream(filters, compress=1)
+
+        # the header and first two entries, then the last entry
+        self.assertEqual(len(chunks), 2)
+
+        content = b"".join(chunks)
+        rows = list(csv.reader(io.StringIO(content.decode("utf-8"))))
+        self.assertEqual(rows[0], [column["label"] for column in get_columns()])
+        self.assertEqual(
+            [row[0] for row in rows[1:]], ["2025-05-16", "2025-05-17", "2025-05-18"]
+        )
+        self.assertEqual([float(row[6]) for row in rows[1:]], [5, 6, 7])
+
+        self.assertEqual(gzip.decompress(b"".join(compressed)), content)
@@ -0,0 +1,169 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+"""Result cache for Stock Balance Report with ledger-driven invalidation.
+
+Every posting bumps version counters for the (item, warehouse) pairs it
+touches, along with counters for each item, each warehouse and the whole
+ledger; renaming or moving items and warehouses bumps a "masters" counter.
+A cached result stores the versions of the counters its filters depend on,
+and it is only served while all of them are unchanged, so it can never be
+stale. Entries also expire after `CACHE_TTL` seconds, and only the
+`MAX_ENTRIES` most recent entries are kept.
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe.utils import getdate
+
+VERSIONS_CACHE_KEY = "xwms_stock_versions"
+RESULTS_CACHE_KEY = "xwms_stock_balance_results"
+RESULTS_INDEX_KEY = "xwms_stock_balance_results_index"
+
+CACHE_TTL = 10 * 60
+MAX_ENTRIES = 200
+# larger results are cheaper to recompute than to keep in redis
+MAX_ROWS = 20000
+
+
+def get_cached_result(filters, compute):
+    """Return `compute(filters)`, served from the cache while the ledger it reads is unchanged."""
+    cache_key = get_cache_key(filters)
+    dependencies = get_dependencies(filters)
+
+    # read versions before computing, so a posting that lands meanwhile
+    # leaves the stored result behind an older version
+    versions = get_versions(dependencies)
+
+    cached = frappe.cache.get_value(f"{RESULTS_CACHE_KEY}:{cache_key}")
+    if cached and cached["versions"] == versions:
+        return cached["result"]
+
+    result = compute(filters)
+    if len(result) <= MAX_ROWS:
+        store_result(cache_key, {"versions": versions, "result": result})
+
+    return result
+
+
+def get_cache_key(filters):
+    normalized = {
+        "posting_date": str(getdate(filters.get("posting_date")))
+        if filters.get("posting_date")
+        else None,
+        "item": filters.get("item") or None,
+        "warehouse": filters.get("warehouse") or None,
+    }
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+
+def get_dependencies(filters):
+    item = filters.get("item")
+    warehouse = filters.get("warehouse")
+
+    if not warehouse:
+        return ["masters", f"item:{item}" if item else "all"]
+
+    leaves = get_leaf_warehouses(warehouse)
+    if item:
+        return ["masters", *(f"pair:{item}|{leaf}" for leaf in leaves)]
+    return ["masters", *(f"warehouse:{leaf}" for leaf in leaves)]
+
+
+def get_leaf_warehouses(warehouse):
+    from xwms.x_warehouse_management_system.doctype.warehouse.warehouse import (
+        get_warehouse_meta,
+    )
+
+    meta = get_warehouse_meta(warehouse)
+    if not meta.is_group:
+        return [warehouse]
+
+    return frappe.get_all(
+        "Warehouse",
+        filters={"lft": [">", meta.lft], "rgt": ["<", meta.rgt], "is_group": 0},
+        order_by="name",
+        pluck="name",
+    )
+
+
+def get_versions(dependencies):
+    # counters are raw redis integers, not the pickled values the
+    # frappe.cache helpers expect, so go through a plain pipeline
+    pipeline = frappe.cache.pipeline()
+    pipeline.hmget(frappe.cache.make_key(VERSIONS_CACHE_KEY), dependencies)
+    (versions,) = pipeline.execute()
+    return [int(version or 0) for version in versions]
+
+
+def store_result(cache_key, entry):
+    frappe.cache.set_value(
+        f"{RESULTS_CACHE_KEY}:{cache_key}", entry, expires_in_sec=CACHE_TTL
+    )
+
+    # keep the newest MAX_ENTRIES results; older ones are dropped early
+    index = frappe.cache.make_key(RESULTS_INDEX_KEY)
+    pipeline = frappe.cache.pipeline()
+    pipeline.zadd(index, {cache_key: frappe.utils.now_datetime().timestamp()})
+    pipeline.zcard(index)
+    _, size = pipeline.execute()
+
+    if size > MAX_ENTRIES:
+        pipeline = frappe.cache.pipeline()
+        pipeline.zpopmin(index, size - MAX_ENTRIES)
+        (evicted,) = pipeline.execute()
+        frappe.cache.delete_value(
+            [f"{RESULTS_CACHE_KEY}:{frappe.safe_decode(key)}" for key, _ in evicted]
+        )
+
+
+def invalidate_pairs(pairs):
+    """Bump the version of every counter the given (item, warehouse) pairs feed.
+
+    Bumped now, so readers in this transaction don't see older results, and
+    again once the transaction commits or rolls back, so a result computed
+    by another reader from the not yet committed state is not served either.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return
+
+    bump_versions(pairs)
+
+    pending = getattr(frappe.local, "xwms_pending_stock_versions", None)
+    if pending is None:
+        pending = frappe.local.xwms_pending_stock_versions = set()
+        frappe.db.after_commit.add(flush_pending_versions)
+        frappe.db.after_rollback.add(flush_pending_versions)
+    pending.update(pairs)
+
+
+def invalidate_masters():
+    """Bump the counter every cached result depends on, for item and warehouse changes."""
+    key = frappe.cache.make_key(VERSIONS_CACHE_KEY)
+    pipeline = frappe.cache.pipeline()
+    pipeline.hincrby(key, "masters", 1)
+    pipeline.execute()
+
+
+def flush_pending_versions():
+    pairs = getattr(frappe.local, "xwms_pending_stock_versions", None)
+    frappe.local.xwms_pending_stock_versions = None
+    if pairs:
+        bump_versions(pairs)
+
+
+def bump_versions(pairs):
+    dependencies = {"all"}
+    for item, warehouse in pairs:
+        dependencies.update(
+            (f"pair:{item}|{warehouse}", f"item:{item}", f"warehouse:{warehouse}")
+        )
+
+    key = frappe.cache.make_key(VERSIONS_CACHE_KEY)
+    pipeline = frappe.cache.pipeline()
+    for dependency in dependencies:
+        pipeline.hincrby(key, dependency, 1)
+    pipeline.execute()
@@ -0,0 +1,233 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+from datetime import timedelta
+
+import frappe
+from frappe.utils import flt, now_datetime
+
+from xwms.x_warehouse_management_system.doctype.bin.bin import (
+    get_bin_details_map,
+    update_bins_from_map,
+)
+from xwms.x_warehouse_management_system.doctype.stock_ledger_entry.stock_ledger_entry import (
+    get_previous_sle,
+)
+from xwms.x_warehouse_management_system.doctype.stock_repost_entry.stock_repost_entry import (
+    queue_repost_for_later_entries,
+)
+from xwms.x_warehouse_management_system.stock_balance_cache import invalidate_pairs
+from xwms.x_warehouse_management_system.valuation import FIFOQueue, get_valuation_methods
+
+SLE_FIELDS = (
+    "name",
+    "creation",
+    "modified",
+    "owner",
+    "modified_by",
+    "docstatus",
+    "idx",
+    "item",
+    "warehouse",
+    "posting_date",
+    "actual_quantity",
+    "valuation_rate",
+    "voucher_type",
+    "voucher_no",
+    "voucher_detail_no",
+    "is_cancelled",
+    "qty_after_transaction",
+    "stock_value_after",
+    "valuation_rate_after",
+    "stock_queue",
+)
+
+REQUIRED_SLE_FIELDS = ("item", "warehouse", "posting_date", "voucher_type", "voucher_no")
+
+
+def make_sl_entries(sl_entries, valuation_methods=None, warehouses_meta=None):
+    """Post a voucher's ledger entries with one multi-row insert.
+
+    Each entry is a dict with item, warehouse, posting_date, actual_quantity,
+    valuation_rate, voucher_type, voucher_no and optionally voucher_detail_no.
+    Entries are posted in the order given, which is also their order within
+    the ledger. Callers that already looked up the items and warehouses pass
+    `valuation_methods` (of existing items only) and `warehouses_meta`, and
+    neither is queried again.
+    """
+    if not sl_entries:
+        return
+
+    validate_sl_entries(sl_entries, valuation_methods, warehouses_meta)
+
+    # lock every bin the voucher touches before reading any balance
+    bins = lock_bins(sl_entries)
+
+    user = frappe.session.user
+    timestamp = now_datetime()
+    valuation_methods = valuation_methods or get_valuation_methods(
+        sle["item"] for sle in sl_entries
+    )
+    running_balances = {}
+    stock_queues = {}
+    bin_queues = {}
+    values = []
+
+    for idx, sle in enumerate(sl_entries):
+        key = (sle["item"], sle["warehouse"])
+        if key not in running_balances:
+            previous_sle = get_previous_sle(
+                sle["item"], sle["warehouse"], sle["posting_date"], for_update=True
+            )
+            running_balances[key] = [
+                flt(previous_sle.qty_after_transaction),
+                flt(previous_sle.stock_value_after),
+            ]
+            if valuation_methods[sle["item"]] == "FIFO":
+                stock_queues[key] = FIFOQueue(previous_sle.stock_queue)
+                # a backdated entry's queue differs from the bin's, which
+                # takes the same change on top of its current batches
+                bin_queues[key] = FIFOQueue(bins[key].stock_queue)
+
+        balance = running_balances[key]
+        balance[0] += sle["actual_quantity"]
+        balance[1] += sle["actual_quantity"] * flt(sle["valuation_rate"])
+
+        stock_queue = stock_queues.get(key)
+        if stock_queue:
+            update_stock_queue(stock_queue, sle)
+            update_stock_queue(bin_queues[key], sle)
+
+        # entries of one voucher share a timestamp, so step creation by a
+        # microsecond to keep their (posting_date, creation) order stable
+        creation = timestamp + timedelta(microseconds=idx)
+
+        values.append(
+            (
+                frappe.generate_hash(length=10),
+                creation,
+                creation,
+                user,
+                user,
+                0,
+                0,
+                sle["item"],
+                sle["warehouse"],
+                sle["posting_date"],
+                sle["actual_quantity"],
+                flt(sle["valuation_rate"]),
+                sle["voucher_type"],
+                sle["voucher_no"],
+                sle.get("voucher_detail_no"),
+                sle.get("is_cancelled", 0),
+                balance[0],
+                balance[1],
+                balance[1] / balance[0] if balance[0] > 0 else 0,
+                stock_queue.as_json() if stock_queue else None,
+            )
+        )
+
+    frappe.db.bulk_insert("Stock Ledger Entry", SLE_FIELDS, values)
+
+    update_bins(sl_entries, bins, bin_queues)
+    invalidate_pairs(bins)
+
+    # entries already posted after these ones now carry stale rates/balances
+    queue_repost_for_later_entries(sl_entries)
+
+
+def update_stock_queue(stock_queue, sle):
+    qty, rate = sle["actual_quantity"], flt(sle["valuation_rate"])
+    if qty > 0:
+        stock_queue.add(qty, rate)
+    elif sle.get("is_cancelled"):
+        # reversing a receipt takes back its own batch, not the oldest one
+        stock_queue.remove_batch(-qty, rate)
+    else:
+        stock_queue.remove(-qty, rate)
+
+
+def validate_sl_entries(sl_entries, valuation_methods=None, warehouses_meta=None):
+    for sle in sl_entries:
+        for fieldname in REQUIRED_SLE_FIELDS:
+            if not sle.get(fieldname):
+                frappe.throw(f"{fieldname} is required for Stock Ledger Entry")
+
+        if not sle.get("actual_quantity"):
+            frappe.throw(
+                f"Quantity cannot be zero for Stock Ledger Entry of {sle['item']}"
+            )
+
+    # check every linked item and warehouse with one query each, or against
+    # what the caller already looked up
+    known = {"Item": valuation_methods, "Warehouse": warehouses_meta}
+    for doctype, fieldname in (("Item", "item"), ("Warehouse", "warehouse")):
+        names = {sle[fieldname] for sle in sl_entries}
+        if known[doctype] is not None:
+            existing = {name for name in names if known[doctype].get(name)}
+        else:
+            existing = set(
+                frappe.get_all(doctype, filters={"name": ["in", list(names)]}, pluck="name")
+            )
+        missing = names - existing
+        if missing:
+            frappe.throw(f"{doctype} not found: {', '.join(sorted(missing))}")
+
+
+def make_reverse_sl_entries(voucher_type, voucher_no):
+    """Cancel a voucher's ledger by posting an opposite entry for each of its entries.
+
+    The voucher's entries are read with one lookup on the voucher_no index,
+    the reversals are posted in one bulk write on the original posting dates
+    and every entry of the voucher, old and new, is then flagged as cancelled
+    with a single update.
+    """
+    sl_entries = frappe.db.sql(
+        """
+            SELECT item, warehouse, posting_date, actual_quantity, valuation_rate,
+                   voucher_type, voucher_no, voucher_detail_no
+            FROM `tabStock Ledger Entry`
+            WHERE voucher_no = %s AND voucher_type = %s AND is_cancelled = 0
+            ORDER BY creation, name
+        """,
+        (voucher_no, voucher_type),
+        as_dict=True,
+    )
+
+    if not sl_entries:
+        return
+
+    # undo the entries last to first, each at the rate it was posted with
+    for sle in reversed(sl_entries):
+        sle.actual_quantity = -sle.actual_quantity
+        sle.is_cancelled = 1
+
+    make_sl_entries(list(reversed(sl_entries)))
+
+    frappe.db.sql(
+        """
+            UPDATE `tabStock Ledger Entry`
+            SET is_cancelled = 1
+            WHERE voucher_no = %s AND voucher_type = %s
+        """,
+        (voucher_no, voucher_type),
+    )
+
+
+def lock_bins(sl_entries):
+    return get_bin_details_map(
+        ((sle["item"], sle["warehouse"]) for sle in sl_entries), for_update=True
+    )
+
+
+def update_bins(sl_entries, bins, stock_queues=None):
+    changes = {}
+    for sle in sl_entries:
+        key = (sle["item"], sle["warehouse"])
+        qty_change, value_change = changes.get(key, (0, 0))
+        changes[key] = (
+            qty_change + sle["actual_quantity"],
+            value_change + sle["actual_quantity"] * flt(sle["valuation_rate"]),
+        )
+
+    update_bins_from_map(bins, changes, stock_queues)
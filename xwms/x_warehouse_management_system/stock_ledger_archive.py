@@ -0,0 +1,216 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+"""Move closed ledger history from Stock Ledger Entry to an archive table.
+
+Entries posted on or before a stock closing date can no longer change, so
+they can move to Stock Ledger Entry Archive. Each (item, warehouse) pair
+keeps one "Opening" entry on the archive date carrying its balance,
+valuation and FIFO queue as of that date. Posting, reposting and balance
+reads after the archive date therefore never touch the archive; reads that
+reach back to it use `get_ledger_table`, which combines both tables.
+"""
+
+import frappe
+from frappe.utils import add_days, add_months, cint, getdate, now_datetime, today
+
+from xwms.x_warehouse_management_system.doctype.bin.bin import get_bin_details_map
+from xwms.x_warehouse_management_system.doctype.stock_closing_entry.stock_closing_entry import (
+    get_last_closing_date,
+)
+from xwms.x_warehouse_management_system.stock_ledger import SLE_FIELDS
+
+LEDGER_TABLE = "`tabStock Ledger Entry`"
+ARCHIVE_TABLE = "`tabStock Ledger Entry Archive`"
+OPENING_VOUCHER_TYPE = "Opening"
+ARCHIVE_CHUNK_SIZE = 5000
+
+# the value an entry aliased `sle` adds to its bin. An opening entry carries
+# the archived balance in stock_value_after, which qty x rate cannot express
+# once the archived quantity nets to zero but its value does not.
+SLE_VALUE = f"""
+    CASE
+        WHEN sle.voucher_type = '{OPENING_VOUCHER_TYPE}' THEN sle.stock_value_after
+        ELSE sle.actual_quantity * sle.valuation_rate
+    END
+"""
+
+
+def get_archived_upto():
+    archived_upto = frappe.db.get_single_value("Stock Settings", "ledger_archived_upto")
+    return getdate(archived_upto) if archived_upto else None
+
+
+def is_archived(posting_date):
+    """Return whether entries posted on `posting_date` live in the archive."""
+    archived_upto = get_archived_upto()
+    return bool(archived_upto and posting_date and getdate(posting_date) <= archived_upto)
+
+
+def get_ledger_table(from_date=None):
+    """Return a table of the ledger entries posted on or after `from_date`, or of all of them.
+
+    Only reads reaching back to the archive date get the archive, combined
+    with the live entries other than the archival's opening entries.
+    """
+    archived_upto = get_archived_upto()
+    if not archived_upto or (from_date and getdate(from_date) > archived_upto):
+        return LEDGER_TABLE
+
+    fields = ", ".join(f"`{field}`" for field in SLE_FIELDS)
+    return f"""(
+        SELECT {fields} FROM {ARCHIVE_TABLE}
+        UNION ALL
+        SELECT {fields} FROM {LEDGER_TABLE}
+        WHERE voucher_type != '{OPENING_VOUCHER_TYPE}'
+    )"""
+
+
+def archive_stock_ledger(before):
+    """Archive the entries posted before `before`, up to the last stock closing before it.
+
+    Pairs move in chunks of about ARCHIVE_CHUNK_SIZE entries, each chunk in
+    its own transaction, so an interrupted run leaves every pair either
+    fully moved or untouched and can simply be run again. Returns the
+    number of entries archived.
+    """
+    archived_upto = get_last_closing_date(add_days(before, -1))
+    previous = get_archived_upto()
+    if not archived_upto or (previous and archived_upto < previous):
+        return 0
+
+    # set first: reads reaching back to the new date combine the archive
+    # with the live entries, which is right for moved and unmoved pairs alike
+    frappe.db.set_single_value("Stock Settings", "ledger_archived_upto", archived_upto)
+    frappe.db.commit()
+
+    archived = 0
+    for pairs, size in get_pair_chunks(archived_upto):
+        archive_pairs(pairs, archived_upto)
+        frappe.db.commit()
+        archived += size
+
+    return archived
+
+
+def get_pair_chunks(archived_upto):
+    counts = frappe.db.sql(
+        f"""
+            SELECT item, warehouse, COUNT(*)
+            FROM {LEDGER_TABLE}
+            WHERE posting_date <= %s AND voucher_type != %s
+            GROUP BY item, warehouse
+            ORDER BY item, warehouse
+        """,
+        (archived_upto, OPENING_VOUCHER_TYPE),
+    )
+
+    chunk, size = [], 0
+    for item, warehouse, count in counts:
+        if chunk and size + count > ARCHIVE_CHUNK_SIZE:
+            yield chunk, size
+            chunk, size = [], 0
+        chunk.append((item, warehouse))
+        size += count
+
+    if chunk:
+        yield chunk, size
+
+
+def archive_pairs(pairs, archived_upto):
+    """Move the pairs' entries up to `archived_upto` to the archive behind an opening entry."""
+    # hold the bins so no posting or repost reads these pairs mid-move
+    get_bin_details_map(pairs, for_update=True)
+
+    conditions = " OR ".join(["(item = %s AND warehouse = %s)"] * len(pairs))
+    pair_values = [value for pair in pairs for value in pair]
+
+    balances = frappe.db.sql(
+        f"""
+            SELECT item, warehouse, qty_after_transaction, stock_value_after,
+                   valuation_rate_after, stock_queue
+            FROM (
+                SELECT item, warehouse, qty_after_transaction, stock_value_after,
+                       valuation_rate_after, stock_queue,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY item, warehouse
+                           ORDER BY posting_date DESC, creation DESC, name DESC
+                       ) AS row_no
+                FROM {LEDGER_TABLE}
+                WHERE posting_date <= %s AND ({conditions})
+            ) latest
+            WHERE row_no = 1
+        """,
+        [archived_upto, *pair_values],
+        as_dict=True,
+    )
+
+    fields = ", ".join(f"`{field}`" for field in SLE_FIELDS)
+    # opening entries of an earlier archival summarize entries that are
+    # already archived, so they are dropped rather than copied
+    frappe.db.sql(
+        f"""
+            INSERT INTO {ARCHIVE_TABLE} ({fields})
+            SELECT {fields}
+            FROM {LEDGER_TABLE}
+            WHERE posting_date <= %s AND voucher_type != %s AND ({conditions})
+        """,
+        [archived_upto, OPENING_VOUCHER_TYPE, *pair_values],
+    )
+    frappe.db.sql(
+        f"""
+            DELETE FROM {LEDGER_TABLE}
+            WHERE posting_date <= %s AND ({conditions})
+        """,
+        [archived_upto, *pair_values],
+    )
+
+    user = frappe.session.user
+    timestamp = now_datetime()
+    frappe.db.bulk_insert(
+        "Stock Ledger Entry",
+        SLE_FIELDS,
+        [
+            (
+                frappe.generate_hash(length=10),
+                timestamp,
+                timestamp,
+                user,
+                user,
+                0,
+                0,
+                row.item,
+                row.warehouse,
+                archived_upto,
+                row.qty_after_transaction,
+                row.stock_value_after / row.qty_after_transaction
+                if row.qty_after_transaction
+                else 0,
+                OPENING_VOUCHER_TYPE,
+                None,
+                None,
+                0,
+                row.qty_after_transaction,
+                row.stock_value_after,
+                row.valuation_rate_after,
+                row.stock_queue,
+            )
+            for row in balances
+        ],
+    )
+
+
+def archive_old_ledger_entries():
+    """Archive entries older than the retention set in Stock Settings, when enabled."""
+    months = cint(frappe.db.get_single_value("Stock Settings", "ledger_retention_months"))
+    if months <= 0:
+        return
+
+    frappe.enqueue(
+        "xwms.x_warehouse_management_system.stock_ledger_archive.archive_stock_ledger",
+        queue="long",
+        timeout=4 * 3600,
+        job_id="xwms_archive_stock_ledger",
+        deduplicate=True,
+        before=add_months(today(), -months),
+    )
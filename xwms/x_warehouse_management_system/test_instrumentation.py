@@ -0,0 +1,87 @@
+# Copyright (c) 2025, SymonMuchemi and Contributors
+# See license.txt
+
+import json
+import frappe
+import uuid
+from unittest.mock import patch
+from frappe.tests.utils import FrappeTestCase
+from xwms.x_warehouse_management_system.instrumentation import (
+    RESPONSE_HEADER,
+    add_instrumentation_header,
+    get_instrumentation_stats,
+    reset_instrumentation_stats,
+)
+
+
+class TestInstrumentation(FrappeTestCase):
+    def setUp(self):
+        self.item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"INSTRUMENT-TV-{uuid.uuid4().hex[:6]}",
+            "item_name": "Instrument TV",
+        }).insert()
+
+        self.warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Instrument WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+        reset_instrumentation_stats()
+        frappe.local.xwms_instrumentation = []
+
+    def tearDown(self):
+        reset_instrumentation_stats()
+        frappe.local.xwms_instrumentation = []
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
+        frappe.db.sql("DELETE FROM `tabStock Entry`")
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.sql("DELETE FROM `tabItem`")
+        frappe.db.commit()
+
+    def test_submit_records_queries_and_stats(self):
+        """ Test that an instrumented submit records its queries, header and running stats. """
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Receipt",
+            "posting_date": "2025-05-15",
+            "to_warehouse": self.warehouse.name,
+            "items": [{"item": self.item.name, "quantity": 5, "valuation_rate": 1000}]
+        }).insert()
+
+        with patch.dict(frappe.conf, {"xwms_instrumentation": 1}):
+            doc.submit()
+
+        calls = {call["call"]: call for call in frappe.local.xwms_instrumentation}
+        on_submit = calls["Stock Entry.on_submit"]
+        self.assertGreater(on_submit["queries"], 0)
+        self.assertTrue(on_submit["slowest"])
+        self.assertLessEqual(len(on_submit["slowest"]), on_submit["queries"])
+        # frappe.db.sql is only routed through the stats while a call runs
+        self.assertNotIn("sql", vars(frappe.db))
+
+        response = frappe._dict(headers={})
+        add_instrumentation_header(response)
+        header = json.loads(response.headers[RESPONSE_HEADER])
+        self.assertIn(
+            {key: on_submit[key] for key in ("call", "wall_ms", "queries", "db_ms")}, header
+        )
+
+        stats = {row["call"]: row for row in get_instrumentation_stats()}
+        self.assertEqual(stats["Stock Entry.on_submit"]["calls"], 1)
+        self.assertEqual(stats["Stock Entry.on_submit"]["avg_queries"], on_submit["queries"])
+
+    def test_disabled_instrumentation_records_nothing(self):
+        """ Test that nothing is recorded while instrumentation is off. """
+        frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": "Receipt",
+            "posting_date": "2025-05-15",
+            "to_warehouse": self.warehouse.name,
+            "items": [{"item": self.item.name, "quantity": 5, "valuation_rate": 1000}]
+        }).insert().submit()
+
+        self.assertEqual(frappe.local.xwms_instrumentation, [])
+        self.assertEqual(get_instrumentation_stats(), [])
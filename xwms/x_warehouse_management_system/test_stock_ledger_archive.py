@@ -0,0 +1,156 @@
+# Copyright (c) 2025, SymonMuchemi and Contributors
+# See license.txt
+
+import frappe
+import uuid
+from unittest.mock import patch
+from frappe.tests.utils import FrappeTestCase
+from xwms.x_warehouse_management_system.report.stock_aging_report import (
+    stock_aging_report,
+)
+from xwms.x_warehouse_management_system.report.stock_balance_report import (
+    stock_balance_report,
+)
+from xwms.x_warehouse_management_system.report.stock_ledger_report import (
+    stock_ledger_report,
+)
+from xwms.x_warehouse_management_system.stock_ledger_archive import archive_stock_ledger
+
+
+class TestStockLedgerArchive(FrappeTestCase):
+    def setUp(self):
+        self.item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"ARCHIVE-TV-{uuid.uuid4().hex[:6]}",
+            "item_name": "Archive TV",
+        }).insert()
+
+        self.warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Archive WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+        self.make_entry("Receipt", "2025-01-10", 10, 100)
+        self.make_entry("Consume", "2025-01-20", 4)
+        frappe.get_doc({
+            "doctype": "Stock Closing Entry",
+            "closing_date": "2025-01-31"
+        }).submit()
+        self.make_entry("Receipt", "2025-02-10", 5, 200)
+
+    def tearDown(self):
+        frappe.db.set_single_value("Stock Settings", "ledger_archived_upto", None)
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry Archive`")
+        frappe.db.sql("DELETE FROM `tabStock Closing Balance`")
+        frappe.db.sql("DELETE FROM `tabStock Closing Entry`")
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
+        frappe.db.sql("DELETE FROM `tabStock Entry`")
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.sql("DELETE FROM `tabItem`")
+        frappe.db.commit()
+
+    def make_entry(self, entry_type, posting_date, quantity, valuation_rate=None):
+        row = {"item": self.item.name, "quantity": quantity}
+        if valuation_rate:
+            row["valuation_rate"] = valuation_rate
+
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": entry_type,
+            "posting_date": posting_date,
+            "from_warehouse": self.warehouse.name if entry_type == "Consume" else None,
+            "to_warehouse": self.warehouse.name if entry_type == "Receipt" else None,
+            "items": [row]
+        }).insert()
+        doc.submit()
+        return doc
+
+    def test_archival_leaves_an_opening_entry(self):
+        """ Test that closed history moves to the archive behind one opening entry. """
+        self.assertEqual(archive_stock_ledger("2025-02-15"), 2)
+
+        archived = frappe.get_all(
+            "Stock Ledger Entry Archive",
+            filters={"item": self.item.name},
+            pluck="actual_quantity",
+            order_by="posting_date",
+        )
+        self.assertEqual(archived, [10, -4])
+
+        entries = frappe.get_all(
+            "Stock Ledger Entry",
+            filters={"item": self.item.name},
+            fields=["voucher_type", "posting_date", "actual_quantity", "stock_value_after"],
+            order_by="posting_date",
+        )
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0].voucher_type, "Opening")
+        self.assertEqual(str(entries[0].posting_date), "2025-01-31")
+        self.assertEqual(entries[0].actual_quantity, 6)
+        self.assertEqual(entries[0].stock_value_after, 600)
+        self.assertEqual(entries[1].stock_value_after, 1600)
+
+    def test_reports_read_the_archive_only_when_reaching_back(self):
+        """ Test that the reports see the same ledger before and after archival. """
+        archive_stock_ledger("2025-02-15")
+
+        _, data = stock_ledger_report.execute({
+            "item": self.item.name,
+            "from_date": "2025-01-01",
+            "to_date": "2025-02-28",
+        })
+        self.assertEqual([row.actual_quantity for row in data], [10, -4, 5])
+
+        _, data = stock_ledger_report.execute({
+            "item": self.item.name,
+            "from_date": "2025-02-01",
+            "to_date": "2025-02-28",
+        })
+        self.assertEqual(data[0].voucher_type, "Opening")
+        self.assertEqual(data[0].qty_after_transaction, 6)
+        self.assertEqual([row.actual_quantity for row in data[1:]], [5])
+
+        _, data = stock_balance_report.execute({
+            "item": self.item.name,
+            "posting_date": "2025-01-15",
+        })
+        self.assertEqual(data[0].qty, 10)
+
+        _, data = stock_balance_report.execute({
+            "item": self.item.name,
+            "posting_date": "2025-02-15",
+        })
+        self.assertEqual(data[0].qty, 11)
+        self.assertEqual(data[0].stock_value, 1600)
+
+    def test_aging_reaches_back_to_archived_receipts(self):
+        """ Test that archival does not reset the age of stock received before it. """
+        archive_stock_ledger("2025-02-15")
+
+        _, data = stock_aging_report.execute({
+            "item": self.item.name,
+            "posting_date": "2025-04-15",
+        })
+        self.assertEqual(data[0].qty, 11)
+        # 6 left of the 2025-01-10 receipt, 5 of the 2025-02-10 one
+        self.assertEqual(data[0].age_91_180, 6)
+        self.assertEqual(data[0].age_31_90, 5)
+
+    def test_aging_skips_the_archive_once_archived_stock_is_issued(self):
+        """ Test that aging reads only the live ledger when no archived stock is left on hand. """
+        archive_stock_ledger("2025-02-15")
+        self.make_entry("Consume", "2025-02-20", 6)
+
+        with patch.object(
+            stock_aging_report, "get_ledger_table", wraps=stock_aging_report.get_ledger_table
+        ) as get_ledger_table:
+            _, data = stock_aging_report.execute({
+                "item": self.item.name,
+                "posting_date": "2025-04-15",
+            })
+
+        get_ledger_table.assert_not_called()
+        self.assertEqual(data[0].qty, 5)
+        self.assertEqual(data[0].age_31_90, 5)
@@ -0,0 +1,95 @@
+# Copyright (c) 2025, SymonMuchemi and Contributors
+# See license.txt
+
+import frappe
+import uuid
+from frappe.tests.utils import FrappeTestCase
+from xwms.x_warehouse_management_system.valuation_rebuild import rebuild_valuation
+
+
+class TestValuationRebuild(FrappeTestCase):
+    def setUp(self):
+        self.item = frappe.get_doc({
+            "doctype": "Item",
+            "code": f"REBUILD-TV-{uuid.uuid4().hex[:6]}",
+            "item_name": "Rebuild TV",
+        }).insert()
+
+        self.warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Rebuild WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+        self.target_warehouse = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Rebuild Target WH-{uuid.uuid4().hex[:6]}",
+            "is_group": 0
+        }).insert()
+
+    def tearDown(self):
+        frappe.db.sql("DELETE FROM `tabStock Repost Entry`")
+        frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+        frappe.db.sql("DELETE FROM `tabBin`")
+        frappe.db.sql("DELETE FROM `tabStock Entry`")
+        frappe.db.sql("DELETE FROM `tabWarehouse`")
+        frappe.db.sql("DELETE FROM `tabItem`")
+        frappe.db.commit()
+
+    def make_entry(self, entry_type, posting_date, quantity, valuation_rate=None):
+        row = {"item": self.item.name, "quantity": quantity}
+        if valuation_rate:
+            row["valuation_rate"] = valuation_rate
+
+        doc = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "type": entry_type,
+            "posting_date": posting_date,
+            "from_warehouse": self.warehouse.name if entry_type != "Receipt" else None,
+            "to_warehouse": (
+                self.warehouse.name if entry_type == "Receipt"
+                else self.target_warehouse.name if entry_type == "Transfer"
+                else None
+            ),
+            "items": [row]
+        }).insert()
+        doc.submit()
+        return doc
+
+    def test_rebuild_corrects_rates_and_transfers(self):
+        """ Test that a dry run reports corrupted rates and a rebuild fixes them. """
+        self.make_entry("Receipt", "2025-05-10", 10, 100)
+        self.make_entry("Receipt", "2025-05-12", 10, 200)
+        transfer = self.make_entry("Transfer", "2025-05-15", 5)
+
+        self.assertFalse(rebuild_valuation(dry_run=True, workers=1).sle_changes)
+
+        # corrupt the outbound rate and the running balances after it
+        frappe.db.sql("""
+            UPDATE `tabStock Ledger Entry`
+            SET valuation_rate = 100, stock_value_after = 9999
+            WHERE voucher_no = %s
+        """, transfer.name)
+
+        result = rebuild_valuation(dry_run=True, workers=1)
+        self.assertEqual(len(result.sle_changes), 2)
+        self.assertEqual(
+            frappe.db.get_value("Stock Ledger Entry", {"voucher_no": transfer.name, "actual_quantity": -5}, "valuation_rate"),
+            100
+        )
+
+        result = rebuild_valuation(workers=1)
+        self.assertEqual(len(result.sle_changes), 2)
+
+        sle = frappe.get_all("Stock Ledger Entry", filters={
+            "voucher_no": transfer.name
+        }, fields=["warehouse", "valuation_rate", "stock_value_after"])
+
+        outbound = next(s for s in sle if s.warehouse == self.warehouse.name)
+        inbound = next(s for s in sle if s.warehouse == self.target_warehouse.name)
+
+        self.assertEqual(outbound.valuation_rate, 150)
+        self.assertEqual(outbound.stock_value_after, 2250)
+        self.assertEqual(inbound.valuation_rate, 150)
+        self.assertEqual(inbound.stock_value_after, 750)
+        self.assertFalse(rebuild_valuation(dry_run=True, workers=1).sle_changes)
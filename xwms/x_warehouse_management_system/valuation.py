@@ -0,0 +1,131 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+import json
+from collections import deque
+
+import frappe
+from frappe.utils import flt
+
+
+def get_valuation_methods(items):
+    """Return {item: valuation method} for many items with one query."""
+    items = list(set(items))
+    methods = dict.fromkeys(items, "Moving Average")
+
+    if items:
+        for item, method in frappe.get_all(
+            "Item",
+            filters={"name": ["in", items]},
+            fields=["name", "valuation_method"],
+            as_list=True,
+        ):
+            methods[item] = method or "Moving Average"
+
+    return methods
+
+
+def get_outgoing_rate(bin_details, valuation_method):
+    """Return the rate the next outflow from a bin is valued at."""
+    # FIFO issues the oldest batch still in the bin's queue next
+    if valuation_method == "FIFO":
+        return FIFOQueue(bin_details.stock_queue).get_next_rate(
+            bin_details.valuation_rate
+        )
+
+    # formula => valuation_rate = total_stock_value / total_stock_qty,
+    # maintained on the bin as each ledger entry is posted
+    return bin_details.valuation_rate
+
+
+class FIFOQueue:
+    """The batches of one (item, warehouse) pair still in stock, oldest first.
+
+    The queue is stored as a compact JSON list of [qty, rate] batches on the
+    Bin and on each ledger entry, and is updated in place by every posting,
+    so working out which batches an outflow consumes only ever looks at the
+    head of the queue. Stock issued beyond what is on hand is kept as one
+    negative batch that the next receipts fill first.
+    """
+
+    def __init__(self, state=None):
+        if isinstance(state, str):
+            state = json.loads(state)
+        self.batches = deque([flt(qty), flt(rate)] for qty, rate in state or [])
+
+    @property
+    def qty(self):
+        return sum(qty for qty, _ in self.batches)
+
+    @property
+    def value(self):
+        return sum(qty * rate for qty, rate in self.batches)
+
+    def get_next_rate(self, default=0):
+        return self.batches[0][1] if self.batches else default
+
+    def add(self, qty, rate):
+        qty, rate = flt(qty), flt(rate)
+        if self.batches and self.batches[-1][0] < 0:
+            # settle the shortfall before the new stock counts as on hand
+            self.batches[-1][0] += qty
+            if self.batches[-1][0] > 0:
+                self.batches[-1][1] = rate
+            elif self.batches[-1][0] == 0:
+                self.batches.pop()
+
+        elif self.batches and self.batches[-1][1] == rate:
+            self.batches[-1][0] += qty
+
+        else:
+            self.batches.append([qty, rate])
+
+    def remove(self, qty, default_rate=0):
+        """Take `qty` from the oldest batches and return the value taken out."""
+        qty = flt(qty)
+        value = 0
+        while qty > 0 and self.batches and self.batches[0][0] > 0:
+            batch = self.batches[0]
+            taken = min(qty, batch[0])
+
+            value += taken * batch[1]
+            batch[0] -= taken
+            qty -= taken
+
+            if batch[0] == 0:
+                self.batches.popleft()
+
+        if qty > 0:
+            # issuing more than is on hand: carry the shortfall at the
+            # latest known rate until stock comes in
+            if self.batches:
+                self.batches[-1][0] -= qty
+                rate = self.batches[-1][1]
+            else:
+                rate = flt(default_rate)
+                self.batches.append([-qty, rate])
+            value += qty * rate
+
+        return value
+
+    def remove_batch(self, qty, rate):
+        """Take back `qty` received at `rate`, as when its receipt is cancelled.
+
+        The newest batches at that rate give it up first; whatever of it was
+        already issued comes from the oldest batches like any other outflow.
+        """
+        qty, rate = flt(qty), flt(rate)
+        for batch in reversed(self.batches):
+            if qty <= 0:
+                break
+            if batch[1] == rate and batch[0] > 0:
+                taken = min(qty, batch[0])
+                batch[0] -= taken
+                qty -= taken
+
+        self.batches = deque(batch for batch in self.batches if batch[0] != 0)
+        if qty > 0:
+            self.remove(qty, rate)
+
+    def as_json(self):
+        return json.dumps(list(self.batches), separators=(",", ":"))
@@ -0,0 +1,427 @@
+# Copyright (c) 2025, SymonMuchemi and contributors
+# For license information, please see license.txt
+
+"""Rebuild moving-average valuation for the whole stock ledger.
+
+Each (item, warehouse) pair is a partition whose running quantity, value
+and rates are recomputed with NumPy array operations, or by replaying the
+stored batch queue for FIFO items. Partitions are spread
+across a process pool. Transfers link partitions together, since an inbound
+leg takes the rate of its outbound leg, so partitions whose inbound rates
+change are recomputed until the rates settle. Corrections are written back
+with bulk updates, or only reported in a dry run.
+
+Run it with no postings in flight, e.g. with the site in maintenance mode.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, repeat
+
+import frappe
+import numpy as np
+from frappe.utils import flt
+
+from xwms.x_warehouse_management_system.stock_balance_cache import invalidate_pairs
+from xwms.x_warehouse_management_system.stock_ledger_archive import OPENING_VOUCHER_TYPE
+from xwms.x_warehouse_management_system.valuation import FIFOQueue, get_valuation_methods
+
+PARTITIONS_PER_TASK = 100
+WRITE_CHUNK_SIZE = 5000
+SCAN_BLOCK = 64
+MAX_PASSES = 20
+
+# values agree when within float error of the array arithmetic; stored
+# currency has 9 decimals, so rounding alone would flag noise as changes
+RTOL = 1e-9
+ATOL = 1e-6
+
+SLE_VALUATION_FIELDS = (
+    "valuation_rate",
+    "qty_after_transaction",
+    "stock_value_after",
+    "valuation_rate_after",
+)
+BIN_VALUATION_FIELDS = ("actual_qty", "stock_value", "valuation_rate")
+
+
+def rebuild_valuation(dry_run=False, workers=None, items=None):
+    """Recompute every ledger entry's rate and running balance, and every bin.
+
+    Returns a dict with the corrections found, as `sle_changes` and
+    `bin_changes` lists of (name, item, warehouse, {field: (old, new)}), and
+    the number of `partitions` and `passes` it took. Unless `dry_run` is
+    set the corrections are also written.
+    """
+    pairs = get_partitions(items)
+    transfer_links = get_transfer_links(items)
+
+    sle_changes = {}
+    bin_changes = {}
+    outflow_rates = {}
+    inflow_rates = {}
+
+    pending = pairs
+    passes = 0
+    with get_executor(workers) as executor:
+        while pending:
+            passes += 1
+            if passes > MAX_PASSES:
+                frappe.throw(
+                    f"Transfer rates did not settle after {MAX_PASSES} passes."
+                )
+
+            chunks = [
+                pending[start : start + PARTITIONS_PER_TASK]
+                for start in range(0, len(pending), PARTITIONS_PER_TASK)
+            ]
+            for result in executor.map(rebuild_partitions, chunks, repeat(inflow_rates)):
+                for pair, changes, bin_change, rates in result:
+                    sle_changes[pair] = changes
+                    bin_changes[pair] = bin_change
+                    outflow_rates.update(rates)
+
+            # inbound legs whose outbound rate moved make another pass
+            pending = set()
+            for outflow, (inflow, pair, stored_rate) in transfer_links.items():
+                rate = outflow_rates.get(outflow)
+                if rate is None:
+                    continue
+                if differs(rate, inflow_rates.get(inflow, stored_rate)):
+                    inflow_rates[inflow] = rate
+                    pending.add(pair)
+            pending = sorted(pending)
+
+    result = frappe._dict(
+        partitions=len(pairs),
+        passes=passes,
+        sle_changes=[change for pair in pairs for change in sle_changes[pair]],
+        bin_changes=[bin_changes[pair] for pair in pairs if bin_changes[pair]],
+    )
+
+    if not dry_run:
+        write_changes("Stock Ledger Entry", result.sle_changes)
+        write_changes("Bin", result.bin_changes)
+        invalidate_pairs(
+            (item, warehouse)
+            for _, item, warehouse, _ in result.sle_changes + result.bin_changes
+        )
+
+    return result
+
+
+def get_partitions(items=None):
+    conditions = "WHERE item IN %(items)s" if items else ""
+    return [
+        tuple(pair)
+        for pair in frappe.db.sql(
+            f"""
+                SELECT DISTINCT item, warehouse
+                FROM `tabStock Ledger Entry`
+                {conditions}
+                ORDER BY item, warehouse
+            """,
+            {"items": tuple(items or ())},
+        )
+    ]
+
+
+def get_transfer_links(items=None):
+    """Map each transfer's outbound entry to (inbound entry, its pair, its rate).
+
+    Legs are matched on voucher_detail_no; entries posted before it was
+    recorded are left at their stored inbound rate.
+    """
+    conditions = "AND inflow.item IN %(items)s" if items else ""
+    links = frappe.db.sql(
+        f"""
+            SELECT outflow.name, inflow.name, inflow.item, inflow.warehouse,
+                   inflow.valuation_rate
+            FROM `tabStock Ledger Entry` inflow
+            JOIN `tabStock Ledger Entry` outflow
+                ON outflow.voucher_no = inflow.voucher_no
+                AND outflow.voucher_detail_no = inflow.voucher_detail_no
+                AND outflow.item = inflow.item
+                AND outflow.warehouse != inflow.warehouse
+                AND outflow.actual_quantity < 0
+            WHERE inflow.actual_quantity > 0
+                AND inflow.voucher_detail_no IS NOT NULL
+                AND inflow.is_cancelled = 0
+                AND outflow.is_cancelled = 0
+                {conditions}
+        """,
+        {"items": tuple(items or ())},
+    )
+
+    return {
+        outflow: (inflow, (item, warehouse), flt(rate))
+        for outflow, inflow, item, warehouse, rate in links
+    }
+
+
+def get_executor(workers):
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return InProcessExecutor()
+
+    # workers open their own site connection rather than share the parent's
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(frappe.local.site, frappe.local.sites_path),
+    )
+
+
+class InProcessExecutor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+def init_worker(site, sites_path):
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+
+
+def rebuild_partitions(pairs, inflow_rates):
+    """Recompute a batch of partitions, streaming their entries in ledger order.
+
+    Returns one (pair, sle_changes, bin_change, outflow_rates) per pair.
+    """
+    conditions = " OR ".join(["(item = %s AND warehouse = %s)"] * len(pairs))
+    values = [value for pair in pairs for value in pair]
+    valuation_methods = get_valuation_methods(item for item, _ in pairs)
+    bins = {
+        (row.item, row.warehouse): row
+        for row in frappe.db.sql(
+            f"""
+                SELECT name, item, warehouse, actual_qty, stock_value, valuation_rate,
+                       stock_queue
+                FROM `tabBin`
+                WHERE {conditions}
+            """,
+            values,
+            as_dict=True,
+        )
+    }
+
+    results = []
+    with frappe.db.unbuffered_cursor():
+        rows = frappe.db.sql(
+            f"""
+                SELECT item, warehouse, name, voucher_type, is_cancelled,
+                       stock_queue, actual_quantity, valuation_rate,
+                       qty_after_transaction, stock_value_after, valuation_rate_after
+                FROM `tabStock Ledger Entry`
+                WHERE {conditions}
+                ORDER BY item, warehouse, posting_date, creation, name
+            """,
+            values,
+            as_iterator=True,
+        )
+
+        for pair, entries in groupby(rows, key=lambda row: (row[0], row[1])):
+            results.append(
+                rebuild_partition(
+                    pair,
+                    list(entries),
+                    bins.get(pair),
+                    inflow_rates,
+                    valuation_methods[pair[0]],
+                )
+            )
+
+    return results
+
+
+def rebuild_partition(pair, entries, bin_details, inflow_rates, valuation_method):
+    names = [entry[2] for entry in entries]
+    stored_queues = [entry[5] for entry in entries]
+    stored = np.array([[flt(value) for value in entry[6:]] for entry in entries])
+    qty = stored[:, 0]
+
+    rate = stored[:, 1].copy()
+    for idx, name in enumerate(names):
+        if name in inflow_rates:
+            rate[idx] = inflow_rates[name]
+
+    # an archival opening entry stands in for the archived history: replay
+    # from its stored balance and queue, and keep it as it is. Cancelled
+    # entries and their reversals stay out of the replay, as if their
+    # voucher never posted, and keep their stored rate.
+    start = 1 if entries[0][3] == OPENING_VOUCHER_TYPE else 0
+    replayed = np.array([not entry[4] for entry in entries])
+    replayed[:start] = False
+    positions = np.flatnonzero(replayed)
+
+    opening = stored[0, 1:] if start else np.zeros(4)
+    opening_queue = stored_queues[0] if start else None
+
+    if valuation_method == "FIFO":
+        computed, queues = compute_fifo(
+            qty[positions], rate[positions], opening[1], opening[2], opening_queue
+        )
+        opening_queue = opening_queue or FIFOQueue().as_json()
+    else:
+        computed = compute_moving_average(
+            qty[positions], rate[positions], opening[1], opening[2]
+        )
+        queues = [None] * len(positions)
+
+    # every row left out of the replay carries the balance and queue of the
+    # last replayed row before it, or the opening ones
+    last = np.searchsorted(positions, np.arange(len(names)), side="right")
+    computed = np.vstack((opening, computed))[last]
+    computed[:, 0] = np.where(replayed, computed[:, 0], stored[:, 1])
+    queues = [opening_queue, *queues]
+    queues = [queues[idx] for idx in last]
+
+    item, warehouse = pair
+    mismatch = differs(computed, stored[:, 1:])
+    queue_mismatch = np.array(
+        [queue != stored_queue for queue, stored_queue in zip(queues, stored_queues, strict=True)]
+    )
+
+    sle_changes = []
+    for idx in np.flatnonzero(mismatch.any(axis=1) | queue_mismatch):
+        fields = {
+            field: (float(stored[idx, col + 1]), float(computed[idx, col]))
+            for col, field in enumerate(SLE_VALUATION_FIELDS)
+            if mismatch[idx, col]
+        }
+        if queue_mismatch[idx]:
+            fields["stock_queue"] = (stored_queues[idx], queues[idx])
+        sle_changes.append((names[idx], item, warehouse, fields))
+
+    outflow_rates = {
+        names[idx]: float(computed[idx, 0])
+        for idx in np.flatnonzero((qty < 0) & replayed)
+    }
+
+    bin_change = None
+    if bin_details:
+        final = dict(
+            zip(BIN_VALUATION_FIELDS, (float(value) for value in computed[-1, 1:]), strict=True)
+        )
+        fields = {
+            field: (flt(bin_details[field]), value)
+            for field, value in final.items()
+            if differs(value, flt(bin_details[field]))
+        }
+        if queues[-1] != bin_details.stock_queue:
+            fields["stock_queue"] = (bin_details.stock_queue, queues[-1])
+        if fields:
+            bin_change = (bin_details.name, item, warehouse, fields)
+
+    return pair, sle_changes, bin_change, outflow_rates
+
+
+def differs(computed, stored):
+    return ~np.isclose(computed, stored, rtol=RTOL, atol=ATOL)
+
+
+def compute_fifo(qty, rate, opening_qty=0.0, opening_value=0.0, opening_queue=None):
+    """Replay a FIFO partition through its batch queue.
+
+    FIFO rates depend on which batches each outflow meets, so this is the one
+    per-entry loop; it only keeps the current queue, never the whole history.
+    """
+    stock_queue = FIFOQueue(opening_queue)
+    computed = np.empty((len(qty), 4))
+    queues = []
+    qty_after, value_after = float(opening_qty), float(opening_value)
+
+    for idx, (entry_qty, entry_rate) in enumerate(zip(qty, rate, strict=True)):
+        entry_qty, entry_rate = float(entry_qty), float(entry_rate)
+        if entry_qty > 0:
+            stock_queue.add(entry_qty, entry_rate)
+        else:
+            fallback_rate = value_after / qty_after if qty_after > 0 else entry_rate
+            entry_rate = stock_queue.remove(-entry_qty, fallback_rate) / -entry_qty
+
+        qty_after += entry_qty
+        value_after += entry_qty * entry_rate
+        computed[idx] = (
+            entry_rate,
+            qty_after,
+            value_after,
+            value_after / qty_after if qty_after > 0 else 0,
+        )
+        queues.append(stock_queue.as_json())
+
+    return computed, queues
+
+
+def compute_moving_average(qty, rate, opening_qty=0.0, opening_value=0.0):
+    """Return (valuation_rate, qty_after, value_after, rate_after) per entry.
+
+    Outflows while stock is on hand go out at the moving average and scale
+    the value by qty_after / qty_before; every other entry adds
+    qty * rate. That makes value a linear recurrence, solved by `scan`.
+    """
+    qty_after = opening_qty + np.cumsum(qty)
+    qty_before = np.concatenate(([opening_qty], qty_after[:-1]))
+
+    averaged = (qty < 0) & (qty_before > 0)
+    safe_qty_before = np.where(averaged, qty_before, 1.0)
+    scale = np.where(averaged, qty_after / safe_qty_before, 1.0)
+    added = np.where(averaged, 0.0, qty * rate)
+
+    value_after = scan(scale, added, opening_value)
+    value_before = np.concatenate(([opening_value], value_after[:-1]))
+
+    valuation_rate = np.where(averaged, value_before / safe_qty_before, rate)
+    positive = qty_after > 0
+    rate_after = np.where(
+        positive, value_after / np.where(positive, qty_after, 1.0), 0.0
+    )
+
+    return np.column_stack((valuation_rate, qty_after, value_after, rate_after))
+
+
+def scan(scale, added, initial):
+    """Solve value[n] = scale[n] * value[n - 1] + added[n] with array operations.
+
+    Within a block, value[n] = P[n] * (initial + sum(added[j] / P[j])) where
+    P is the running product of `scale`. A zero scale (an outflow that
+    empties the stock) restarts the sum from zero. Blocks are kept short so
+    P stays well within float range.
+    """
+    values = np.empty_like(added)
+    for start in range(0, len(added), SCAN_BLOCK):
+        block_scale = scale[start : start + SCAN_BLOCK]
+        block_added = added[start : start + SCAN_BLOCK]
+
+        emptied = block_scale == 0
+        product = np.cumprod(np.where(emptied, 1.0, block_scale))
+        sums = np.cumsum(block_added / product)
+
+        positions = np.arange(len(block_scale))
+        last_emptied = np.maximum.accumulate(np.where(emptied, positions, -1))
+        restarted = last_emptied >= 0
+        base = np.where(restarted, sums[np.maximum(last_emptied, 0)], -initial)
+
+        values[start : start + SCAN_BLOCK] = product * (sums - base)
+        initial = values[start + len(block_scale) - 1]
+
+    return values
+
+
+def write_changes(doctype, changes):
+    for start in range(0, len(changes), WRITE_CHUNK_SIZE):
+        frappe.db.bulk_update(
+            doctype,
+            {
+                name: {field: new for field, (_, new) in fields.items()}
+                for name, _, _, fields in changes[start : start + WRITE_CHUNK_SIZE]
+            },
+            update_modified=False,
+        )
+        frappe.db.commit()